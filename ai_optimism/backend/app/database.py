@@ -1,16 +1,62 @@
-from sqlmodel import SQLModel, create_engine, Session
+import orjson
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 
 sqlite_file_name = "ai_optimism.db"
-sqlite_url = f"sqlite:///{sqlite_file_name}"
+sqlite_url = f"sqlite+aiosqlite:///{sqlite_file_name}"
 
 connect_args = {"check_same_thread": False}
-engine = create_engine(sqlite_url, connect_args=connect_args)
 
+def _json_serializer(value) -> str:
+    return orjson.dumps(value).decode()
 
-def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
+# JSON columns (message metadata) are encoded/decoded with orjson instead of the stdlib json module
+engine = create_async_engine(
+    sqlite_url,
+    connect_args=connect_args,
+    # Sized for bursts of concurrent requests; waiters give up after pool_timeout seconds
+    pool_size=20,
+    max_overflow=10,
+    pool_timeout=30,
+    pool_pre_ping=True,
+    json_serializer=_json_serializer,
+    json_deserializer=orjson.loads,
+)
 
 
-def get_session():
-    with Session(engine) as session:
+@event.listens_for(engine.sync_engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Per-connection SQLite tuning: WAL journal, no fsync per commit, in-memory temp tables"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.execute("PRAGMA cache_size=-65536")
+    cursor.close()
+
+
+# One pooled session factory for every request; objects stay usable after commit
+async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+def _create_all(sync_conn):
+    SQLModel.metadata.create_all(sync_conn)
+    # create_all skips tables that already exist, so indexes added later are created here
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+    # Superseded by the partial ix_session_waiting index
+    sync_conn.exec_driver_sql("DROP INDEX IF EXISTS ix_session_status")
+
+
+async def create_db_and_tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(_create_all)
+
+
+async def get_session():
+    async with async_session() as session:
         yield session
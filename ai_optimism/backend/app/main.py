@@ -1,25 +1,69 @@
+"""
+AI Optimism Toolkit API
+
+Middleware rule: only pure ASGI middleware may be registered (classes taking
+(scope, receive, send), see app/middleware/). BaseHTTPMiddleware and the
+@app.middleware("http") decorator buffer every response body through an extra
+stream, which costs throughput on every endpoint and breaks streaming responses.
+Startup fails if one is registered.
+"""
 from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
 from contextlib import asynccontextmanager
 from .routers import optimization, evaluate, sessions
-from .database import create_db_and_tables
+from .database import create_db_and_tables, engine
+from .utils.evaluation import start_process_pool, shutdown_process_pool
+from .utils.http_client import start_http_client, close_http_client
+from .utils.heartbeats import start_heartbeat_flusher, stop_heartbeat_flusher
+from .middleware.cors import PureASGICORSMiddleware
+from .middleware.timing import ResponseTimeMiddleware
+from .middleware.body_limit import BodySizeLimitMiddleware
+
+
+def assert_pure_asgi_middleware(app: FastAPI) -> None:
+    """Raise if any BaseHTTPMiddleware (including @app.middleware("http")) is registered"""
+    for middleware in app.user_middleware:
+        if isinstance(middleware.cls, type) and issubclass(middleware.cls, BaseHTTPMiddleware):
+            dispatch = middleware.kwargs.get("dispatch")
+            name = getattr(dispatch, "__name__", None) or middleware.cls.__name__
+            raise RuntimeError(
+                f"Middleware '{name}' uses BaseHTTPMiddleware; write it as pure ASGI middleware instead"
+            )
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    create_db_and_tables()
+    assert_pure_asgi_middleware(app)
+    await create_db_and_tables()
+    start_process_pool()
+    start_http_client()
+    start_heartbeat_flusher()
     yield
+    await stop_heartbeat_flusher()
+    await close_http_client()
+    shutdown_process_pool()
+    await engine.dispose()
+
+app = FastAPI(title="AI Optimism Toolkit API", lifespan=lifespan, default_response_class=ORJSONResponse)
 
-app = FastAPI(title="AI Optimism Toolkit API", lifespan=lifespan)
+# Reject oversized bodies before Pydantic parses them, so one huge payload can't stall the
+# event loop for every other request. Registered first so it sits inside CORS and 413s
+# still carry the CORS headers the browser needs to read them
+app.add_middleware(BodySizeLimitMiddleware)  # 1 MiB default
 
 # Configure CORS for frontend integration - MUST be before routers
+# Pure ASGI implementation: preflights are answered without entering the router
 app.add_middleware(
-    CORSMiddleware,
+    PureASGICORSMiddleware,
     allow_origins=["*"],  # Allow all origins for development
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+app.add_middleware(ResponseTimeMiddleware)
+
 # Include routers
 app.include_router(optimization.router, prefix="/api")
 
@@ -0,0 +1,62 @@
+"""
+Pure ASGI request body size guard
+Rejects oversized bodies with 413 before FastAPI/Pydantic materialize them
+"""
+from typing import Optional
+from fastapi import HTTPException
+
+DEFAULT_MAX_BODY_BYTES = 1024 * 1024  # 1 MiB
+
+
+class BodySizeLimitMiddleware:
+    """Answer 413 for request bodies larger than max_body_bytes"""
+
+    def __init__(self, app, max_body_bytes: int = DEFAULT_MAX_BODY_BYTES):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        content_length: Optional[int] = None
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                try:
+                    content_length = int(value)
+                except ValueError:
+                    pass
+                break
+
+        # Declared length is known up front: reject without calling the app at all
+        if content_length is not None and content_length > self.max_body_bytes:
+            await self.reject(send)
+            return
+
+        # Chunked or lying clients: count bytes as they are streamed in. FastAPI re-raises
+        # HTTPExceptions coming from receive while reading the body, so this becomes a 413
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes:
+                    raise HTTPException(status_code=413, detail="Request body too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    async def reject(self, send) -> None:
+        body = b'{"detail":"Request body too large"}'
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
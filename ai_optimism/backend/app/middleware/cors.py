@@ -0,0 +1,155 @@
+"""
+Pure ASGI CORS middleware
+Mirrors Starlette's CORSMiddleware origin/method/header checks, but works directly on the
+raw ASGI messages so every request avoids building Request/Response objects
+"""
+from typing import Iterable, List, Optional, Tuple
+
+Header = Tuple[bytes, bytes]
+
+ALL_METHODS = ("DELETE", "GET", "HEAD", "OPTIONS", "PATCH", "POST", "PUT")
+SAFELISTED_HEADERS = {"Accept", "Accept-Language", "Content-Language", "Content-Type"}
+
+
+class PureASGICORSMiddleware:
+    """Add CORS headers to responses and answer preflight requests without entering the router"""
+
+    def __init__(
+        self,
+        app,
+        allow_origins: Iterable[str] = (),
+        allow_methods: Iterable[str] = ("GET",),
+        allow_headers: Iterable[str] = (),
+        allow_credentials: bool = False,
+        max_age: int = 600,
+    ):
+        self.app = app
+        allow_origins = list(allow_origins)
+        allow_methods = list(allow_methods)
+        allow_headers = list(allow_headers)
+
+        self.allow_all_origins = "*" in allow_origins
+        self.allow_all_headers = "*" in allow_headers
+        self.allow_origins = {origin.encode("latin-1") for origin in allow_origins}
+        self.allow_methods = ALL_METHODS if "*" in allow_methods else tuple(m.upper() for m in allow_methods)
+        # Advertised as configured (Starlette's casing and order), matched case-insensitively
+        advertised_headers = sorted(SAFELISTED_HEADERS | set(allow_headers))
+        self.allow_headers = {h.lower() for h in advertised_headers}
+        self.allow_credentials = allow_credentials
+
+        # Credentialed or origin-restricted preflights must echo the origin instead of "*"
+        self.preflight_explicit_allow_origin = not self.allow_all_origins or allow_credentials
+
+        # Headers added to every simple (non-preflight) response
+        self.simple_headers: List[Header] = []
+        if self.allow_all_origins:
+            self.simple_headers.append((b"access-control-allow-origin", b"*"))
+        if allow_credentials:
+            self.simple_headers.append((b"access-control-allow-credentials", b"true"))
+
+        # Headers shared by every successful preflight response
+        self.preflight_headers: List[Header] = []
+        if self.preflight_explicit_allow_origin:
+            self.preflight_headers.append((b"vary", b"Origin"))
+        else:
+            self.preflight_headers.append((b"access-control-allow-origin", b"*"))
+        self.preflight_headers += [
+            (b"access-control-allow-methods", ", ".join(self.allow_methods).encode("latin-1")),
+            (b"access-control-max-age", str(max_age).encode("latin-1")),
+        ]
+        if not self.allow_all_headers:
+            self.preflight_headers.append(
+                (b"access-control-allow-headers", ", ".join(advertised_headers).encode("latin-1"))
+            )
+        if allow_credentials:
+            self.preflight_headers.append((b"access-control-allow-credentials", b"true"))
+
+    def is_allowed_origin(self, origin: bytes) -> bool:
+        return self.allow_all_origins or origin in self.allow_origins
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        origin: Optional[bytes] = None
+        request_method: Optional[bytes] = None
+        request_headers: Optional[bytes] = None
+        has_cookie = False
+        for name, value in scope["headers"]:
+            if name == b"origin":
+                origin = value
+            elif name == b"access-control-request-method":
+                request_method = value
+            elif name == b"access-control-request-headers":
+                request_headers = value
+            elif name == b"cookie":
+                has_cookie = True
+
+        if origin is None:
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] == "OPTIONS" and request_method is not None:
+            await self.preflight_response(send, origin, request_method, request_headers)
+            return
+
+        await self.app(scope, receive, self.simple_send(send, origin, has_cookie))
+
+    async def preflight_response(
+        self, send, origin: bytes, request_method: bytes, request_headers: Optional[bytes]
+    ) -> None:
+        """Answer a CORS preflight directly (400 if the origin, method or headers are not allowed)"""
+        headers = list(self.preflight_headers)
+        failures = []
+
+        if self.is_allowed_origin(origin):
+            if self.preflight_explicit_allow_origin:
+                headers.append((b"access-control-allow-origin", origin))
+        else:
+            failures.append("origin")
+
+        if request_method.decode("latin-1").upper() not in self.allow_methods:
+            failures.append("method")
+
+        if self.allow_all_headers and request_headers is not None:
+            headers.append((b"access-control-allow-headers", request_headers))
+        elif request_headers is not None:
+            for header in request_headers.decode("latin-1").lower().split(","):
+                if header.strip() not in self.allow_headers:
+                    failures.append("headers")
+                    break
+
+        if failures:
+            status = 400
+            body = f"Disallowed CORS {', '.join(failures)}".encode("utf-8")
+        else:
+            status = 200
+            body = b"OK"
+
+        headers.append((b"content-type", b"text/plain; charset=utf-8"))
+        headers.append((b"content-length", str(len(body)).encode("latin-1")))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    def simple_send(self, send, origin: bytes, has_cookie: bool):
+        """Wrap send so the CORS headers are appended to http.response.start"""
+        extra_headers = self.simple_headers
+        if self.allow_all_origins and has_cookie:
+            # Cookies make this a credentialed request, which may not be answered with "*"
+            extra_headers = self.simple_headers_for(origin)
+        elif not self.allow_all_origins and self.is_allowed_origin(origin):
+            extra_headers = self.simple_headers_for(origin)
+
+        async def send_with_cors(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", ())) + extra_headers
+            await send(message)
+
+        return send_with_cors
+
+    def simple_headers_for(self, origin: bytes) -> List[Header]:
+        headers = [h for h in self.simple_headers if h[0] != b"access-control-allow-origin"]
+        headers.append((b"access-control-allow-origin", origin))
+        headers.append((b"vary", b"Origin"))
+        return headers
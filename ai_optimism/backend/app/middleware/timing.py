@@ -0,0 +1,29 @@
+"""
+Pure ASGI response-time middleware
+Adds an x-response-time header (milliseconds) without touching the response body stream
+"""
+import time
+
+
+class ResponseTimeMiddleware:
+    """Measure time until the response starts and report it in x-response-time"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                message["headers"] = list(message.get("headers", ())) + [
+                    (b"x-response-time", f"{elapsed_ms:.2f}ms".encode("latin-1"))
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_timing)
@@ -1,9 +1,9 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Dict, Any, List, Optional
 
 class EvaluationRequest(BaseModel):
     """Request to evaluate expressions"""
-    expressions: List[str]  # List of Python expressions to evaluate
+    expressions: List[str] = Field(max_length=1000)  # List of Python expressions to evaluate
     variables: Dict[str, Any]  # Variable name -> value mapping
 
 
@@ -17,3 +17,21 @@ class EvaluationResult(BaseModel):
 class EvaluationResponse(BaseModel):
     """Response containing all evaluation results"""
     results: List[EvaluationResult]
+
+
+class BatchEvaluationRequest(BaseModel):
+    """Request to evaluate expressions over many variable assignments at once"""
+    expressions: List[str] = Field(max_length=1000)  # List of Python expressions to evaluate
+    variable_batch: Dict[str, List[float]]  # Variable name -> one value per candidate
+
+
+class BatchEvaluationResult(BaseModel):
+    """Result of evaluating one expression over every candidate"""
+    expression: str
+    values: List[Optional[float]]
+    errors: List[Optional[str]]
+
+
+class BatchEvaluationResponse(BaseModel):
+    """Response containing batch evaluation results"""
+    results: List[BatchEvaluationResult]
@@ -1,9 +1,15 @@
 from typing import List, Optional, Dict, Any
 from sqlmodel import SQLModel, Field, Relationship, JSON
-from pydantic import BaseModel
+from sqlalchemy import Column, Index, Integer, text
+from sqlalchemy.orm import column_property
+from pydantic import BaseModel, TypeAdapter, AliasChoices
+from pydantic import Field as PydanticField
 import time
 
 class Message(SQLModel, table=True):
+    # Message listings filter by session and read in timestamp order: one range scan, no sort
+    __table_args__ = (Index("ix_message_session_timestamp", "sessionId", "timestamp"),)
+
     id: str = Field(primary_key=True)
     sessionId: str = Field(foreign_key="session.id")
     sender: str
@@ -16,7 +22,22 @@ class Message(SQLModel, table=True):
     class Config:
         populate_by_name = True
 
+# SQLite's implicit rowid (the primary key is a string, so every message has one) follows
+# insertion order and breaks timestamp ties, e.g. within a bulk insert. A system column is
+# never created or written, and mapping it lets aliased joined loads order by it too.
+MESSAGE_ROWID = Column("rowid", Integer, system=True)
+Message.__table__.append_column(MESSAGE_ROWID)
+Message.__mapper__.add_property("rowid", column_property(MESSAGE_ROWID))
+
 class Session(SQLModel, table=True):
+    # Researchers poll for status == "waiting"; a partial index holds only those rows, so it
+    # stays tiny however many active/closed sessions accumulate
+    __table_args__ = (
+        Index("ix_session_waiting", "status", sqlite_where=text("status = 'waiting'")),
+        # Serves the (updatedAt, id) keyset paging of the list endpoints
+        Index("ix_session_updated_id", "updatedAt", "id"),
+    )
+
     id: str = Field(primary_key=True)
     mode: str
     status: str
@@ -29,7 +50,15 @@ class Session(SQLModel, table=True):
     isAIResponding: Optional[bool] = False
     readyToFormalize: Optional[bool] = False
     
-    messages: List[Message] = Relationship(back_populates="session", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
+    # Loaded in (timestamp, rowid) order, which the (sessionId, timestamp) index already
+    # provides (SQLite appends the rowid to every index key)
+    messages: List[Message] = Relationship(
+        back_populates="session",
+        sa_relationship_kwargs={
+            "cascade": "all, delete-orphan",
+            "order_by": [Message.timestamp, MESSAGE_ROWID],
+        },
+    )
 
 # Response models to ensure proper serialization
 class MessageResponse(BaseModel):
@@ -38,7 +67,10 @@ class MessageResponse(BaseModel):
     sender: str
     content: str
     timestamp: int
-    metadata: Optional[Dict[str, Any]] = None
+    # ORM rows keep this in metadata_ (SQLModel.metadata is the table MetaData)
+    metadata: Optional[Dict[str, Any]] = PydanticField(
+        default=None, validation_alias=AliasChoices("metadata_", "metadata")
+    )
 
     class Config:
         from_attributes = True
@@ -47,14 +79,10 @@ class MessageResponse(BaseModel):
     @classmethod
     def from_orm_message(cls, message: "Message") -> "MessageResponse":
         """Create MessageResponse from ORM Message object"""
-        return cls(
-            id=message.id,
-            sessionId=message.sessionId,
-            sender=message.sender,
-            content=message.content,
-            timestamp=message.timestamp,
-            metadata=message.metadata_ if hasattr(message, 'metadata_') else None
-        )
+        return cls.model_validate(message, from_attributes=True)
+
+# Serializes a whole message list in a single pydantic-core pass
+MESSAGE_LIST_ADAPTER = TypeAdapter(List[MessageResponse])
 
 class SessionResponse(BaseModel):
     id: str
@@ -73,6 +101,28 @@ class SessionResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class SessionSummaryResponse(BaseModel):
+    """Session listing entry without message bodies"""
+    id: str
+    mode: str
+    status: str
+    userId: str
+    researcherId: Optional[str] = None
+    createdAt: int
+    updatedAt: int
+    lastActivity: int
+    isResearcherTyping: Optional[bool] = False
+    isAIResponding: Optional[bool] = False
+    readyToFormalize: Optional[bool] = False
+    messageCount: int = 0
+
+    class Config:
+        from_attributes = True
+
+# Serialize whole session listings in a single pydantic-core pass
+SESSION_LIST_ADAPTER = TypeAdapter(List[SessionResponse])
+SESSION_SUMMARY_LIST_ADAPTER = TypeAdapter(List[SessionSummaryResponse])
+
 class CreateSessionRequest(SQLModel):
     mode: str
     userId: Optional[str] = "default-user"
@@ -103,12 +153,12 @@ class AddMessageRequest(SQLModel):
 
 class AISessionConfig(SQLModel, table=True):
     """AI provider configuration for a session (stores encrypted API key)"""
-    sessionId: str = Field(primary_key=True, foreign_key="session.id")
+    sessionId: str = Field(primary_key=True, foreign_key="session.id")  # primary key, so already indexed
     provider: str
     api_key_encrypted: str
     model: str
     endpoint: Optional[str] = None
-    status: str = "disconnected"  # 'disconnected' | 'connected' | 'error'
+    status: str = "disconnected"  # 'disconnected' | 'pending' | 'connected' | 'error'
     lastValidated: Optional[int] = None
     setBy: str  # 'user' | 'researcher'
     setAt: int
@@ -1,12 +1,29 @@
 """
 API endpoint for safely evaluating Python expressions
 """
+import asyncio
+import logging
+import math
+from concurrent.futures.process import BrokenProcessPool
 from fastapi import APIRouter, HTTPException
-from ..models.evaluate import EvaluationRequest, EvaluationResponse, EvaluationResult
-from ..utils.evaluation import safe_eval
+from fastapi.responses import ORJSONResponse
+import numpy as np
+from ..models.evaluate import (
+    EvaluationRequest, EvaluationResponse,
+    BatchEvaluationRequest, BatchEvaluationResponse
+)
+from ..utils.evaluation import (
+    evaluate_expression_list, safe_eval_batch, get_process_pool, restart_process_pool,
+    PROCESS_POOL_WORKERS
+)
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Requests with more expressions than this are split across the worker processes;
+# smaller ones are evaluated inline, where pickling would cost more than it saves
+PARALLEL_THRESHOLD = 128
+
 
 @router.post("/", response_model=EvaluationResponse)
 async def evaluate_expressions(request: EvaluationRequest):
@@ -20,21 +37,63 @@ async def evaluate_expressions(request: EvaluationRequest):
     - Functions: abs, min, max, sum, round, sqrt, exp, log, sin, cos, tan
     - Variables: Any numeric or string values provided in variables dict
     """
-    results = []
+    # Evaluate each distinct expression once and scatter results back into request order
+    unique = list(dict.fromkeys(request.expressions))
+    pool = get_process_pool()
+    unique_results = None
     
-    for expr in request.expressions:
+    if len(unique) > PARALLEL_THRESHOLD and pool is not None:
+        loop = asyncio.get_running_loop()
+        chunk_size = math.ceil(len(unique) / PROCESS_POOL_WORKERS)
         try:
-            value = safe_eval(expr, request.variables)
-            results.append(EvaluationResult(
-                expression=expr,
-                value=value if isinstance(value, (int, float)) else None,
-                error=None
-            ))
-        except Exception as e:
-            results.append(EvaluationResult(
-                expression=expr,
-                value=None,
-                error=str(e)
+            parts = await asyncio.gather(*(
+                loop.run_in_executor(
+                    pool, evaluate_expression_list, unique[i:i + chunk_size], request.variables
+                )
+                for i in range(0, len(unique), chunk_size)
             ))
+            unique_results = [result for part in parts for result in part]
+        except BrokenProcessPool:
+            # A dead worker breaks the whole pool: replace it for later requests and
+            # answer this one inline
+            logger.exception("Evaluation process pool broke; restarting it")
+            restart_process_pool()
+    
+    if unique_results is None:
+        unique_results = evaluate_expression_list(unique, request.variables)
+    
+    by_expression = dict(zip(unique, unique_results))
+    results = [by_expression[expr] for expr in request.expressions]
+    
+    # Results are built server-side with known types: serialize the dicts directly
+    # instead of constructing and validating an EvaluationResult per expression
+    return ORJSONResponse(content={"results": results})
+
+
+@router.post("/batch", response_model=BatchEvaluationResponse)
+async def evaluate_batch(request: BatchEvaluationRequest):
+    """
+    Evaluate expressions over a whole population of candidate variable assignments
+    
+    Each expression is evaluated once over NumPy arrays (one value per candidate) instead
+    of once per candidate, so an optimization generation needs a single request.
+    Supports the same syntax as the scalar endpoint.
+    """
+    sizes = {len(values) for values in request.variable_batch.values()}
+    if len(sizes) > 1:
+        raise HTTPException(status_code=400, detail="All variable arrays must have the same length")
+    size = sizes.pop() if sizes else 0
+    
+    variable_batch = {
+        name: np.asarray(values, dtype=np.float64)
+        for name, values in request.variable_batch.items()
+    }
+    
+    results = []
+    for expr in request.expressions:
+        values, errors = safe_eval_batch(expr, variable_batch, size)
+        # orjson serializes the float64 array directly (NaN becomes null)
+        results.append({"expression": expr, "values": values, "errors": errors})
     
-    return EvaluationResponse(results=results)
+    # Plain dict response: skips re-validating the output against BatchEvaluationResponse
+    return ORJSONResponse(content={"results": results})
@@ -1,8 +1,10 @@
+import logging
 from fastapi import APIRouter, HTTPException
 from typing import List
 from ..models.optimization import OptimizationProblem, OptimizationConfig
 from ..services.optimization_service import OptimizationService
 
+logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/optimization", tags=["optimization"])
 optimization_service = OptimizationService()
 
@@ -22,9 +24,7 @@ async def execute_optimization(config: OptimizationConfig):
     try:
         return optimization_service.run_optimization(config)
     except Exception as e:
-        import traceback
-        print(f"Optimization error: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Optimization error: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
     
 @router.delete("/problems/clear/")
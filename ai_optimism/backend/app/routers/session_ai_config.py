@@ -1,64 +1,126 @@
 """AI configuration endpoints for sessions"""
-from fastapi import APIRouter, HTTPException, Depends
-import time
-from sqlmodel import Session as DBSession, select
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from typing import Any, Dict, Optional
+from sqlmodel import select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel.ext.asyncio.session import AsyncSession as DBSession
 from ..models.session import (
-    Session, AISessionConfig, AISessionConfigResponse, SetAISessionConfigRequest
+    AISessionConfig, AISessionConfigResponse, SetAISessionConfigRequest
 )
-from ..utils.session_helpers import validate_api_key
-from ..utils.encryption import encrypt_api_key, decrypt_api_key
-from ..database import get_session
+from ..utils.session_helpers import (
+    validate_api_key_bounded, check_api_key_format, session_exists, json_response,
+    cached_ai_config_body, store_ai_config_body, invalidate_ai_config_body
+)
+from ..utils.common import now_ms
+from ..utils.encryption import encrypt_api_key, decrypt_api_key, forget_decrypted_api_key
+from ..database import get_session, async_session
 
 router = APIRouter(prefix="/{session_id}/ai-config", tags=["sessions"])
 
+# A still-connected key validated within this window is not re-stamped on every validate click
+REVALIDATION_WRITE_INTERVAL_MS = 30_000
+
 
 @router.get("", response_model=AISessionConfigResponse)
 async def get_ai_config(session_id: str, db: DBSession = Depends(get_session)):
     """Get AI provider configuration for a session (status only, no API key)"""
-    session = db.get(Session, session_id)
-    if not session:
+    body = cached_ai_config_body(session_id)
+    if body is not None:
+        return json_response(body)
+
+    if not await session_exists(db, session_id):
         raise HTTPException(status_code=404, detail="Session not found")
     
     # Load AI config if it exists
-    ai_config = db.exec(
+    ai_config = (await db.exec(
         select(AISessionConfig).where(AISessionConfig.sessionId == session_id)
-    ).first()
+    )).first()
     
     if not ai_config:
         raise HTTPException(status_code=404, detail="AI config not found for this session")
     
-    return AISessionConfigResponse(
-        sessionId=ai_config.sessionId,
-        provider=ai_config.provider,
-        model=ai_config.model,
-        endpoint=ai_config.endpoint,
-        status=ai_config.status,
-        lastValidated=ai_config.lastValidated,
-        setBy=ai_config.setBy,
-        setAt=ai_config.setAt,
-        errorMessage=ai_config.errorMessage,
-    )
+    body = AISessionConfigResponse.model_validate(ai_config, from_attributes=True).model_dump_json()
+    store_ai_config_body(session_id, body, ai_config.status)
+    return json_response(body)
+
+
+async def record_validation_result(
+    db: DBSession, session_id: str, validated_key_encrypted: str, values: Dict[str, Any]
+) -> Optional[Any]:
+    """
+    Store a validation result only if the validated key is still the stored one
+    A key pushed while the provider was being asked gets a new ciphertext (Fernet tokens are
+    never reused), so a stale result matches no row; returns the updated row, or None then.
+    """
+    row = (await db.exec(
+        update(AISessionConfig)
+        .where(
+            AISessionConfig.sessionId == session_id,
+            AISessionConfig.api_key_encrypted == validated_key_encrypted,
+        )
+        .values(**values)
+        .returning(*AISessionConfig.__table__.c)
+    )).first()
+    await db.commit()
+    return row
+
+
+async def validate_and_update_ai_config(session_id: str) -> None:
+    """Background task: validate the stored API key and record the resulting status"""
+    async with async_session() as db:
+        ai_config = await db.get(AISessionConfig, session_id)
+        if not ai_config:
+            return
+        validated_key_encrypted = ai_config.api_key_encrypted
+        
+        try:
+            api_key = decrypt_api_key(validated_key_encrypted, session_id)
+            is_valid, error_msg = await validate_api_key_bounded(
+                ai_config.provider, api_key, ai_config.model, ai_config.endpoint
+            )
+        except Exception as e:
+            is_valid, error_msg = False, f"Failed to decrypt API key: {str(e)}"
+        
+        if is_valid:
+            values = dict(status="connected", lastValidated=now_ms(), errorMessage=None)
+        elif is_valid is None:
+            # Provider unreachable or rate limited: keep the status, just say why it is unconfirmed
+            values = dict(errorMessage=error_msg)
+        else:
+            values = dict(status="error", errorMessage=error_msg or "Invalid API key")
+        
+        row = await record_validation_result(db, session_id, validated_key_encrypted, values)
+        if row is None:
+            return  # the key was replaced meanwhile; its own task records its status
+        store_ai_config_body(
+            session_id, AISessionConfigResponse.model_validate(row._mapping).model_dump_json(), row.status
+        )
 
 
 @router.post("", response_model=AISessionConfigResponse)
 async def set_ai_config(
     session_id: str,
     request: SetAISessionConfigRequest,
+    background_tasks: BackgroundTasks,
+    now: int = Depends(now_ms),
     db: DBSession = Depends(get_session)
 ):
-    """Set AI provider configuration for a session (encrypts API key before storage)"""
-    session = db.get(Session, session_id)
-    if not session:
+    """
+    Set AI provider configuration for a session (encrypts API key before storage)
+    The config is stored as 'pending' and the key is validated after the response is sent;
+    poll GET to see the resulting 'connected' or 'error' status (GET /key refuses it until connected).
+    """
+    if not await session_exists(db, session_id):
         raise HTTPException(status_code=404, detail="Session not found")
     
     # Validate setBy value
     if request.setBy not in ["user", "researcher"]:
         raise HTTPException(status_code=400, detail="setBy must be 'user' or 'researcher'")
     
-    # Validate API key
-    is_valid, error_msg = await validate_api_key(request.provider, request.apiKey, request.model, request.endpoint)
-    if not is_valid:
-        raise HTTPException(status_code=400, detail=error_msg or "Invalid API key")
+    # Malformed keys are rejected right away; only the provider round trip runs in the background
+    format_error = check_api_key_format(request.provider, request.apiKey)
+    if format_error:
+        raise HTTPException(status_code=400, detail=format_error)
     
     # Encrypt the API key
     try:
@@ -66,76 +128,62 @@ async def set_ai_config(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to encrypt API key: {str(e)}")
     
-    current_time = int(time.time() * 1000)
-    
-    # Check if config already exists
-    existing_config = db.exec(
-        select(AISessionConfig).where(AISessionConfig.sessionId == session_id)
-    ).first()
-    
-    if existing_config:
-        # Update existing config
-        existing_config.provider = request.provider
-        existing_config.api_key_encrypted = encrypted_key
-        existing_config.model = request.model
-        existing_config.endpoint = request.endpoint
-        existing_config.status = "connected"
-        existing_config.lastValidated = current_time
-        existing_config.setBy = request.setBy
-        existing_config.setAt = current_time
-        existing_config.errorMessage = None
-        db.add(existing_config)
-        config = existing_config
-    else:
-        # Create new config
-        ai_config = AISessionConfig(
-            sessionId=session_id,
-            provider=request.provider,
-            api_key_encrypted=encrypted_key,
-            model=request.model,
-            endpoint=request.endpoint,
-            status="connected",
-            lastValidated=current_time,
-            setBy=request.setBy,
-            setAt=current_time,
-            errorMessage=None,
-        )
-        db.add(ai_config)
-        config = ai_config
-    
-    db.commit()
-    db.refresh(config)
-    
-    return AISessionConfigResponse(
-        sessionId=config.sessionId,
-        provider=config.provider,
-        model=config.model,
-        endpoint=config.endpoint,
-        status=config.status,
-        lastValidated=config.lastValidated,
-        setBy=config.setBy,
-        setAt=config.setAt,
-        errorMessage=config.errorMessage,
+    # One atomic UPSERT instead of SELECT-then-INSERT/UPDATE; lastValidated keeps its old value
+    # on update, and RETURNING hands back the stored row without another query
+    values = dict(
+        provider=request.provider,
+        api_key_encrypted=encrypted_key,
+        model=request.model,
+        endpoint=request.endpoint,
+        status="pending",
+        setBy=request.setBy,
+        setAt=now,
+        errorMessage=None,
     )
+    upsert = (
+        sqlite_insert(AISessionConfig)
+        .values(sessionId=session_id, lastValidated=None, **values)
+        .on_conflict_do_update(index_elements=[AISessionConfig.sessionId], set_=values)
+        .returning(*AISessionConfig.__table__.c)
+    )
+    config = (await db.exec(upsert)).one()
+    await db.commit()
+    # The replaced key's plaintext must not stay in memory
+    forget_decrypted_api_key(session_id)
+    
+    # Validate outside the request path
+    background_tasks.add_task(validate_and_update_ai_config, session_id)
+    
+    body = AISessionConfigResponse.model_validate(config._mapping).model_dump_json()
+    store_ai_config_body(session_id, body, config.status)
+    return json_response(body)
 
 
 @router.get("/key")
 async def get_ai_config_key(session_id: str, db: DBSession = Depends(get_session)):
     """Get decrypted API key for a session (for client-side AI connection)"""
-    session = db.get(Session, session_id)
-    if not session:
+    if not await session_exists(db, session_id):
         raise HTTPException(status_code=404, detail="Session not found")
     
-    ai_config = db.exec(
+    ai_config = (await db.exec(
         select(AISessionConfig).where(AISessionConfig.sessionId == session_id)
-    ).first()
+    )).first()
     
     if not ai_config:
         raise HTTPException(status_code=404, detail="AI config not found for this session")
     
+    # Only a key the provider accepted is handed out; a pushed key stays unusable until
+    # the background validation marks it connected
+    if ai_config.status != "connected":
+        raise HTTPException(
+            status_code=409,
+            detail=f"API key is not validated (status: {ai_config.status})"
+            + (f": {ai_config.errorMessage}" if ai_config.errorMessage else ""),
+        )
+    
     # Decrypt the API key
     try:
-        api_key = decrypt_api_key(ai_config.api_key_encrypted)
+        api_key = decrypt_api_key(ai_config.api_key_encrypted, session_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to decrypt API key: {str(e)}")
     
@@ -152,47 +200,58 @@ async def get_ai_config_key(session_id: str, db: DBSession = Depends(get_session
 @router.post("/validate")
 async def validate_ai_config(session_id: str, db: DBSession = Depends(get_session)):
     """Validate the stored API key for a session"""
-    session = db.get(Session, session_id)
-    if not session:
+    if not await session_exists(db, session_id):
         raise HTTPException(status_code=404, detail="Session not found")
     
-    ai_config = db.exec(
+    ai_config = (await db.exec(
         select(AISessionConfig).where(AISessionConfig.sessionId == session_id)
-    ).first()
+    )).first()
     
     if not ai_config:
         raise HTTPException(status_code=404, detail="AI config not found for this session")
     
     # Decrypt the API key
     try:
-        api_key = decrypt_api_key(ai_config.api_key_encrypted)
+        api_key = decrypt_api_key(ai_config.api_key_encrypted, session_id)
     except Exception as e:
         # Update status to error
         ai_config.status = "error"
         ai_config.errorMessage = f"Failed to decrypt API key: {str(e)}"
         db.add(ai_config)
-        db.commit()
+        await db.commit()
+        invalidate_ai_config_body(session_id)
         raise HTTPException(status_code=500, detail="Failed to decrypt API key")
     
     # Validate the API key
-    is_valid, error_msg = await validate_api_key(ai_config.provider, api_key, ai_config.model, ai_config.endpoint)
+    is_valid, error_msg = await validate_api_key_bounded(ai_config.provider, api_key, ai_config.model, ai_config.endpoint)
     
-    current_time = int(time.time() * 1000)
+    # Taken after validation returns, which may take up to API_KEY_VALIDATION_TIMEOUT
+    current_time = now_ms()
     
+    values: Dict[str, Any] = {}
     if is_valid:
-        ai_config.status = "connected"
-        ai_config.lastValidated = current_time
-        ai_config.errorMessage = None
-    else:
-        ai_config.status = "error"
-        ai_config.errorMessage = error_msg or "Validation failed"
+        # Still connected and confirmed recently: keep the stored lastValidated
+        recently_validated = (
+            ai_config.status == "connected"
+            and current_time - (ai_config.lastValidated or 0) < REVALIDATION_WRITE_INTERVAL_MS
+        )
+        if not recently_validated:
+            values = dict(status="connected", lastValidated=current_time, errorMessage=None)
+    elif is_valid is False:
+        values = dict(status="error", errorMessage=error_msg or "Validation failed")
+    # is_valid None: provider unreachable or rate limited, so the stored status stands
     
-    db.add(ai_config)
-    db.commit()
+    status, last_validated = ai_config.status, ai_config.lastValidated
+    # Repeat validations that change nothing skip the write (and its WAL fsync)
+    if any(getattr(ai_config, key) != value for key, value in values.items()):
+        row = await record_validation_result(db, session_id, ai_config.api_key_encrypted, values)
+        if row is None:
+            raise HTTPException(status_code=409, detail="API key was replaced during validation")
+        invalidate_ai_config_body(session_id)
+        status, last_validated = row.status, row.lastValidated
     
     return {
-        "status": "connected" if is_valid else "error",
+        "status": status,
         "message": "Validation successful" if is_valid else (error_msg or "Validation failed"),
-        "lastValidated": current_time if is_valid else ai_config.lastValidated,
+        "lastValidated": last_validated,
     }
-
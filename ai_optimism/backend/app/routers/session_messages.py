@@ -1,61 +1,144 @@
 """Message endpoints for sessions"""
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
-import time
-from sqlmodel import Session as DBSession, select
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import ORJSONResponse
+from typing import List, Optional
+from sqlmodel import select
+from sqlalchemy.orm import raiseload
+from sqlmodel.ext.asyncio.session import AsyncSession as DBSession
 from ..models.session import (
-    Message, AddMessageRequest, MessageResponse, Session
+    Message, AddMessageRequest, MessageResponse, Session, MESSAGE_LIST_ADAPTER, MESSAGE_ROWID
+)
+from ..utils.common import generate_id, detect_formalization_readiness, now_ms
+from ..utils.session_helpers import (
+    json_response, session_lock, invalidate_session_body
 )
-from ..utils.common import generate_id, detect_formalization_readiness
 from ..database import get_session
 
 router = APIRouter(prefix="/{session_id}/messages", tags=["sessions"])
 
 
-@router.post("", response_model=MessageResponse)
-async def add_message(session_id: str, request: AddMessageRequest, db: DBSession = Depends(get_session)):
-    """Add a message to a session"""
-    session = db.get(Session, session_id)
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-
-    message = Message(
-        id=generate_id(),
-        sessionId=session_id,
-        sender=request.sender,
-        content=request.content,
-        timestamp=int(time.time() * 1000),
-        metadata_=request.metadata,
-    )
-
-    db.add(message)
-    
-    session.updatedAt = int(time.time() * 1000)
-    session.lastActivity = int(time.time() * 1000)
-
-    # Update session status based on message context
-    if request.sender == "user" and session.mode == "experimental":
+def _on_user_message(session: Session, content: str) -> None:
+    """User messages in experimental mode wait for the researcher"""
+    if session.mode == "experimental":
         session.status = "waiting"
         session.readyToFormalize = False
-    elif request.sender == "researcher":
-        session.status = "active"
-        if detect_formalization_readiness(request.content):
-            session.readyToFormalize = True
-    elif request.sender == "ai":
-        session.status = "active"
-        if detect_formalization_readiness(request.content):
-            session.readyToFormalize = True
-            
-    db.add(session)
-    db.commit()
-    db.refresh(message)
-
-    return MessageResponse.from_orm_message(message)
 
 
-@router.get("", response_model=List[MessageResponse])
-async def get_messages(session_id: str, db: DBSession = Depends(get_session)):
-    """Get all messages for a session"""
-    messages = db.exec(select(Message).where(Message.sessionId == session_id)).all()
-    return [MessageResponse.from_orm_message(m) for m in messages]
+def _on_reply(session: Session, content: str) -> None:
+    """Researcher and AI replies reactivate the session and may signal readiness"""
+    session.status = "active"
+    # Once flagged, later replies cannot unset it, so skip the scan
+    if not session.readyToFormalize and detect_formalization_readiness(content):
+        session.readyToFormalize = True
+
+
+def _on_other_sender(session: Session, content: str) -> None:
+    pass
+
+
+_SENDER_HANDLERS = {
+    "user": _on_user_message,
+    "researcher": _on_reply,
+    "ai": _on_reply,
+}
+
+
+def update_session_for_message(session: Session, request: AddMessageRequest) -> None:
+    """Update session status based on message context"""
+    _SENDER_HANDLERS.get(request.sender, _on_other_sender)(session, request.content)
+
+
+@router.post("", response_model=MessageResponse)
+async def add_message(session_id: str, request: AddMessageRequest, now: int = Depends(now_ms), db: DBSession = Depends(get_session)):
+    """Add a message to a session"""
+    # Status and readiness are derived from the latest message, so concurrent posts to the
+    # same session must not interleave between reading the row and committing it
+    async with session_lock(session_id):
+        session = await db.get(Session, session_id, options=[raiseload("*")])
+        if not session:
+            raise HTTPException(status_code=404, detail="Session not found")
 
+        message = Message(
+            id=generate_id(),
+            sessionId=session_id,
+            sender=request.sender,
+            content=request.content,
+            timestamp=now,
+            metadata_=request.metadata,
+        )
+
+        db.add(message)
+
+        # session is attached to db, so its changes are flushed with the same commit
+        session.updatedAt = now
+        session.lastActivity = now
+        update_session_for_message(session, request)
+
+        # No refresh needed: every column was set here and nothing expires on commit
+        await db.commit()
+        invalidate_session_body(session_id)
+
+    return json_response(MessageResponse.from_orm_message(message).model_dump_json())
+
+
+@router.post("/bulk", response_model=List[MessageResponse])
+async def add_messages_bulk(session_id: str, requests: List[AddMessageRequest], now: int = Depends(now_ms), db: DBSession = Depends(get_session)):
+    """Add several messages to a session in one transaction (e.g. when replaying a transcript)"""
+    async with session_lock(session_id):
+        session = await db.get(Session, session_id, options=[raiseload("*")])
+        if not session:
+            raise HTTPException(status_code=404, detail="Session not found")
+
+        # The whole batch shares one timestamp; rowid (insertion order) keeps it in request order
+        messages = [
+            Message(
+                id=generate_id(),
+                sessionId=session_id,
+                sender=request.sender,
+                content=request.content,
+                timestamp=now,
+                metadata_=request.metadata,
+            )
+            for request in requests
+        ]
+        db.add_all(messages)
+
+        session.updatedAt = now
+        session.lastActivity = now
+        for request in requests:
+            update_session_for_message(session, request)
+
+        db.add(session)
+        await db.commit()
+        invalidate_session_body(session_id)
+
+    return json_response(MESSAGE_LIST_ADAPTER.dump_json([MessageResponse.from_orm_message(m) for m in messages]))
+
+
+@router.get("", response_model=List[MessageResponse])
+async def get_messages(
+    session_id: str,
+    limit: Optional[int] = Query(None, ge=1, description="Only return the most recent N messages"),
+    db: DBSession = Depends(get_session),
+):
+    """Get all messages for a session (or only the most recent `limit` ones)"""
+    # Plain column tuples: no ORM hydration and no Pydantic pass (rows were validated on insert)
+    query = select(
+        Message.id, Message.sessionId, Message.sender,
+        Message.content, Message.timestamp, Message.metadata_,
+    ).where(Message.sessionId == session_id)
+    # rowid breaks timestamp ties in insertion order; the index already ends with it
+    if limit is None:
+        rows = (await db.exec(query.order_by(Message.timestamp, MESSAGE_ROWID))).all()
+    else:
+        # Walk the (sessionId, timestamp) index backwards and restore chronological order
+        rows = (await db.exec(
+            query.order_by(Message.timestamp.desc(), MESSAGE_ROWID.desc()).limit(limit)
+        )).all()[::-1]
+    return ORJSONResponse(content=[
+        {
+            "id": id_, "sessionId": session_id_, "sender": sender,
+            "content": content, "timestamp": timestamp, "metadata": metadata,
+        }
+        for id_, session_id_, sender, content, timestamp, metadata in rows
+    ])
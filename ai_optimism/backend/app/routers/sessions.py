@@ -1,16 +1,23 @@
 """Session CRUD endpoints"""
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
-import time
-from sqlmodel import Session as DBSession, select
-from sqlalchemy.orm import selectinload
+from fastapi import APIRouter, HTTPException, Depends, Query
+from typing import List, Optional, Union
+from sqlmodel import select, delete, update, func, or_, and_
+from sqlalchemy import insert
+from sqlmodel.ext.asyncio.session import AsyncSession as DBSession
+from sqlalchemy.orm import selectinload, joinedload, raiseload
+from sqlalchemy.orm.attributes import set_committed_value
 from ..models.session import (
-    Session, CreateSessionRequest, UpdateSessionRequest,
-    SessionResponse, MessageUpdateItem
+    Session, Message, AISessionConfig, CreateSessionRequest, UpdateSessionRequest,
+    SessionResponse, SessionSummaryResponse, MessageUpdateItem,
+    SESSION_LIST_ADAPTER, SESSION_SUMMARY_LIST_ADAPTER
 )
-from ..utils.common import generate_id
+from ..utils.common import generate_id, now_ms
+from ..utils.heartbeats import record_heartbeat
+from ..utils.encryption import forget_decrypted_api_key
 from ..utils.session_helpers import (
-    session_to_response, get_msg_attr, is_valid_metadata
+    session_to_response, session_to_summary, is_valid_metadata, json_response,
+    cached_session_body, store_session_body, invalidate_session_body, invalidate_ai_config_body,
+    session_exists
 )
 from ..database import get_session
 from .session_messages import router as messages_router
@@ -24,166 +31,238 @@ router.include_router(ai_config_router)
 
 
 @router.post("/", response_model=SessionResponse)
-async def create_session(request: CreateSessionRequest, db: DBSession = Depends(get_session)):
+async def create_session(request: CreateSessionRequest, now: int = Depends(now_ms), db: DBSession = Depends(get_session)):
     """Create a new chat session"""
-    session = Session(
+    values = dict(
         id=generate_id(),
         mode=request.mode,
         status="active",
         userId=request.userId,
         researcherId=request.researcherId,
-        createdAt=int(time.time() * 1000),
-        updatedAt=int(time.time() * 1000),
-        lastActivity=int(time.time() * 1000),
+        createdAt=now,
+        updatedAt=now,
+        lastActivity=now,
+        isResearcherTyping=False,
+        isAIResponding=False,
         readyToFormalize=False,
     )
-    db.add(session)
-    db.commit()
-    db.refresh(session)
-    # Reload with messages
-    session = db.exec(select(Session).where(Session.id == session.id).options(selectinload(Session.messages))).first()
-    return session_to_response(session)
+    # Single-row Core INSERT: every column is known here, so there is nothing for the ORM unit
+    # of work or a refresh to add, and the response is built from the same values
+    await db.exec(insert(Session).values(**values))
+    await db.commit()
+    return json_response(SessionResponse(**values).model_dump_json())
 
 
-@router.get("/", response_model=List[SessionResponse])
-async def list_sessions(db: DBSession = Depends(get_session)):
-    """Get all sessions"""
-    sessions = db.exec(select(Session).options(selectinload(Session.messages))).all()
-    return [session_to_response(s) for s in sessions]
+def page_sessions(statement, limit: Optional[int], before: Optional[int], before_id: Optional[str] = None):
+    """Keyset page over sessions, newest (updatedAt, id) first, when a limit or cursor is given"""
+    if before is not None:
+        # id breaks ties so sessions sharing the cursor's updatedAt are neither skipped nor repeated
+        if before_id is not None:
+            statement = statement.where(or_(
+                Session.updatedAt < before,
+                and_(Session.updatedAt == before, Session.id < before_id),
+            ))
+        else:
+            statement = statement.where(Session.updatedAt < before)
+    if limit is not None or before is not None:
+        statement = statement.order_by(Session.updatedAt.desc(), Session.id.desc())
+    if limit is not None:
+        statement = statement.limit(limit)
+    return statement
+
+
+async def list_session_summaries(
+    db: DBSession, *where, limit: Optional[int] = None, before: Optional[int] = None,
+    before_id: Optional[str] = None,
+) -> List[SessionSummaryResponse]:
+    """Sessions with their message counts in one grouped query, without loading messages"""
+    message_count = func.count(Message.id)
+    statement = (
+        select(Session, message_count)
+        .outerjoin(Message, Message.sessionId == Session.id)
+        .where(*where)
+        .group_by(Session.id)
+        .options(raiseload("*"))
+    )
+    rows = (await db.exec(page_sessions(statement, limit, before, before_id))).all()
+    return [session_to_summary(session, count) for session, count in rows]
+
+
+# Optional paging shared by the list endpoints; without it every matching session is returned
+LIMIT_QUERY = Query(None, ge=1, le=200, description="Page size (newest updatedAt, then id, first)")
+BEFORE_QUERY = Query(None, description="Only sessions with updatedAt below this cursor")
+BEFORE_ID_QUERY = Query(None, description="Cursor tiebreak: also include sessions with updatedAt equal to before and a lower id")
+
+
+@router.get("/", response_model=Union[List[SessionResponse], List[SessionSummaryResponse]])
+async def list_sessions(
+    include_messages: bool = True,
+    limit: Optional[int] = LIMIT_QUERY,
+    before: Optional[int] = BEFORE_QUERY,
+    before_id: Optional[str] = BEFORE_ID_QUERY,
+    db: DBSession = Depends(get_session),
+):
+    """Get all sessions (include_messages=false returns summaries with message counts)"""
+    if not include_messages:
+        return json_response(SESSION_SUMMARY_LIST_ADAPTER.dump_json(
+            await list_session_summaries(db, limit=limit, before=before, before_id=before_id)
+        ))
+    # raiseload("*") on every session query: any relationship not loaded up front raises
+    # instead of silently issuing one lazy SELECT per row
+    statement = select(Session).options(selectinload(Session.messages), raiseload("*"))
+    sessions = (await db.exec(page_sessions(statement, limit, before, before_id))).all()
+    return json_response(SESSION_LIST_ADAPTER.dump_json([session_to_response(s) for s in sessions]))
 
 
 @router.get("/{session_id}", response_model=SessionResponse)
 async def get_session_by_id(session_id: str, db: DBSession = Depends(get_session)):
     """Get a specific session by ID"""
-    session = db.exec(select(Session).where(Session.id == session_id).options(selectinload(Session.messages))).first()
+    # Polling clients mostly re-read unchanged sessions: check the two version columns first
+    # and serve the cached body while they still match
+    version = (await db.exec(
+        select(Session.updatedAt, Session.lastActivity).where(Session.id == session_id)
+    )).first()
+    if version is None:
+        invalidate_session_body(session_id)
+        raise HTTPException(status_code=404, detail="Session not found")
+    version = tuple(version)
+    body = cached_session_body(session_id, version)
+    if body is not None:
+        return json_response(body)
+
+    # One parent row: a JOIN fetches session and messages in a single round trip
+    session = (await db.exec(
+        select(Session).where(Session.id == session_id).options(joinedload(Session.messages), raiseload("*"))
+    )).unique().first()
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
-    return session_to_response(session)
+    body = session_to_response(session).model_dump_json()
+    store_session_body(session_id, (session.updatedAt, session.lastActivity), body)
+    return json_response(body)
 
 
 @router.put("/{session_id}", response_model=SessionResponse)
-async def update_session(session_id: str, request: UpdateSessionRequest, db: DBSession = Depends(get_session)):
+async def update_session(session_id: str, request: UpdateSessionRequest, now: int = Depends(now_ms), db: DBSession = Depends(get_session)):
     """Update a session"""
-    # Load session with messages relationship
-    session = db.exec(select(Session).where(Session.id == session_id).options(selectinload(Session.messages))).first()
+    # Load session with messages relationship (joined: one round trip for a single session)
+    session = (await db.exec(
+        select(Session).where(Session.id == session_id).options(joinedload(Session.messages), raiseload("*"))
+    )).unique().first()
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
 
     # Update fields if provided (excluding messages which we handle separately)
-    session_data = request.model_dump(exclude_unset=True)
-    messages_to_update = session_data.pop("messages", None)
+    session_data = request.model_dump(exclude_unset=True, exclude={"messages"})
     
+    # Only real changes dirty the session; an update that changes nothing skips the write
+    dirty = False
     for key, value in session_data.items():
-        setattr(session, key, value)
+        if getattr(session, key) != value:
+            setattr(session, key, value)
+            dirty = True
 
     # Handle message updates if provided
     if request.messages is not None:
-        # Create a dictionary of message IDs to the updated message objects for quick lookup
-        updated_messages_dict = {}
-        for msg in request.messages:
-            msg_id = get_msg_attr(msg, 'id')
-            if msg_id:
-                updated_messages_dict[msg_id] = msg
+        existing_by_id = {message.id: message for message in session.messages}
         
-        # Update existing messages in the database
-        for existing_message in session.messages:
-            if existing_message.id in updated_messages_dict:
-                updated_message = updated_messages_dict[existing_message.id]
-                
-                # Update content if changed
-                new_content = get_msg_attr(updated_message, 'content')
-                if new_content is not None and new_content != existing_message.content:
-                    existing_message.content = new_content
-                
-                # Update metadata if changed
-                new_metadata = None
-                
-                # Try attribute access directly (MessageUpdateItem is a Pydantic model)
-                if hasattr(updated_message, 'metadata'):
-                    metadata_val = getattr(updated_message, 'metadata', None)
-                    if is_valid_metadata(metadata_val):
-                        new_metadata = metadata_val
-                
-                # Try model_dump (Pydantic models support this)
-                if new_metadata is None:
-                    try:
-                        if hasattr(updated_message, 'model_dump'):
-                            msg_dict = updated_message.model_dump(exclude_unset=False)
-                            metadata_val = msg_dict.get('metadata')
-                            if is_valid_metadata(metadata_val):
-                                new_metadata = metadata_val
-                    except Exception:
-                        pass  # Fall through to next method
-                
-                # Try as dictionary (fallback)
-                if new_metadata is None and isinstance(updated_message, dict):
-                    metadata_val = updated_message.get('metadata')
-                    if is_valid_metadata(metadata_val):
-                        new_metadata = metadata_val
-                
-                # Update metadata if we found valid metadata
-                if new_metadata is not None and isinstance(new_metadata, dict):
-                    existing_message.metadata_ = new_metadata
-                
-                # Update sender if changed
-                new_sender = get_msg_attr(updated_message, 'sender')
-                if new_sender is not None and new_sender != existing_message.sender:
-                    existing_message.sender = new_sender
-                
-                # Update timestamp if changed
-                new_timestamp = get_msg_attr(updated_message, 'timestamp')
-                if new_timestamp is not None and new_timestamp != existing_message.timestamp:
-                    existing_message.timestamp = new_timestamp
-                
-                db.add(existing_message)
-
-    session.updatedAt = int(time.time() * 1000)
-    db.add(session)
-    db.commit()
-    db.refresh(session)
+        # Changed rows are sent as one executemany UPDATE (a fixed column set keeps them in a
+        # single batch); the loaded messages are patched as committed state so the response
+        # reflects the edits without the unit of work emitting per-row UPDATEs again
+        updates = []
+        for updated_message in request.messages:
+            existing_message = existing_by_id.get(updated_message.id)
+            if existing_message is None:
+                continue
+
+            values = {
+                "content": updated_message.content,
+                "sender": updated_message.sender,
+                "timestamp": updated_message.timestamp,
+                # Only a real dict replaces the stored metadata (None leaves it untouched)
+                "metadata_": (
+                    updated_message.metadata if is_valid_metadata(updated_message.metadata)
+                    else existing_message.metadata_
+                ),
+            }
+            if all(getattr(existing_message, key) == value for key, value in values.items()):
+                continue
+
+            for key, value in values.items():
+                set_committed_value(existing_message, key, value)
+            updates.append({"id": existing_message.id, **values})
+
+        if updates:
+            await db.exec(update(Message), params=updates)
+            dirty = True
+            # Edited timestamps can change the order a fresh load (ORDER BY timestamp) returns
+            set_committed_value(session, "messages", sorted(
+                session.messages, key=lambda message: (message.timestamp, message.rowid)
+            ))
+
+    if dirty:
+        session.updatedAt = now
+        await db.commit()
     
-    # Reload with messages to ensure we have the latest data
-    session = db.exec(select(Session).where(Session.id == session_id).options(selectinload(Session.messages))).first()
-    return session_to_response(session)
+    # Messages were loaded above and updated in place; nothing expires on commit
+    body = session_to_response(session).model_dump_json()
+    store_session_body(session_id, (session.updatedAt, session.lastActivity), body)
+    return json_response(body)
 
 
 @router.post("/{session_id}/heartbeat")
-async def session_heartbeat(session_id: str, db: DBSession = Depends(get_session)):
+async def session_heartbeat(session_id: str, now: int = Depends(now_ms), db: DBSession = Depends(get_session)):
     """Update session last activity timestamp"""
-    session = db.get(Session, session_id)
-    if not session:
+    # Read-only existence check; the write itself is buffered and flushed in batches
+    if not await session_exists(db, session_id):
         raise HTTPException(status_code=404, detail="Session not found")
-    
-    session.lastActivity = int(time.time() * 1000)
-    db.add(session)
-    db.commit()
+    record_heartbeat(session_id, now)
     return {"status": "ok"}
 
 
 @router.delete("/{session_id}")
 async def delete_session(session_id: str, db: DBSession = Depends(get_session)):
     """Delete a session"""
-    session = db.get(Session, session_id)
-    if not session:
+    # Bulk DELETEs instead of loading the session and its messages to cascade in Python
+    await db.exec(delete(Message).where(Message.sessionId == session_id))
+    await db.exec(delete(AISessionConfig).where(AISessionConfig.sessionId == session_id))
+    result = await db.exec(delete(Session).where(Session.id == session_id))
+    if result.rowcount == 0:
+        await db.rollback()
         raise HTTPException(status_code=404, detail="Session not found")
-    
-    db.delete(session)
-    db.commit()
+    await db.commit()
+    invalidate_session_body(session_id)
+    invalidate_ai_config_body(session_id)
+    forget_decrypted_api_key(session_id)
     return {"message": "Session deleted"}
 
 
-@router.get("/waiting/", response_model=List[SessionResponse])
-async def get_waiting_sessions(db: DBSession = Depends(get_session)):
-    """Get sessions waiting for researcher response"""
-    sessions = db.exec(select(Session).where(Session.status == "waiting").options(selectinload(Session.messages))).all()
-    return [session_to_response(s) for s in sessions]
+@router.get("/waiting/", response_model=Union[List[SessionResponse], List[SessionSummaryResponse]])
+async def get_waiting_sessions(
+    include_messages: bool = True,
+    limit: Optional[int] = LIMIT_QUERY,
+    before: Optional[int] = BEFORE_QUERY,
+    before_id: Optional[str] = BEFORE_ID_QUERY,
+    db: DBSession = Depends(get_session),
+):
+    """Get sessions waiting for researcher response (include_messages=false returns summaries)"""
+    if not include_messages:
+        return json_response(SESSION_SUMMARY_LIST_ADAPTER.dump_json(
+            await list_session_summaries(db, Session.status == "waiting", limit=limit, before=before, before_id=before_id)
+        ))
+    statement = select(Session).where(Session.status == "waiting").options(selectinload(Session.messages), raiseload("*"))
+    sessions = (await db.exec(page_sessions(statement, limit, before, before_id))).all()
+    return json_response(SESSION_LIST_ADAPTER.dump_json([session_to_response(s) for s in sessions]))
 
 
 @router.delete("/clear/")
 async def clear_all_sessions(db: DBSession = Depends(get_session)):
     """Clear all sessions (for testing/development)"""
-    sessions = db.exec(select(Session)).all()
-    for session in sessions:
-        db.delete(session)
-    db.commit()
+    # One bulk DELETE per table instead of loading every session and cascading row by row
+    await db.exec(delete(Message))
+    await db.exec(delete(AISessionConfig))
+    await db.exec(delete(Session))
+    await db.commit()
+    invalidate_session_body()
+    invalidate_ai_config_body()
+    forget_decrypted_api_key()
     return {"message": "All sessions cleared"}
@@ -1,6 +1,9 @@
+import logging
 from typing import List, Dict
 from ..models.optimization import OptimizationProblem, OptimizationConfig
 
+logger = logging.getLogger(__name__)
+
 class OptimizationService:
     def __init__(self):
         self.problems: Dict[str, OptimizationProblem] = {}
@@ -97,7 +100,7 @@ class OptimizationService:
         seed_designs = []
         max_attempts = 1000
         
-        print(f"Generating seed designs with {len(problem.constraints or [])} constraints...")
+        logger.debug("Generating seed designs with %d constraints...", len(problem.constraints or []))
         
         for seed_idx in range(min(10, config.population_size)):
             # Try to generate a valid design
@@ -125,12 +128,12 @@ class OptimizationService:
                 if all_constraints_satisfied:
                     # Convert to tuple for hashability
                     seed_designs.append(tuple(sorted(design.items())))
-                    print(f"  Seed {seed_idx + 1}: Valid design found on attempt {attempt + 1}")
+                    logger.debug("  Seed %d: Valid design found on attempt %d", seed_idx + 1, attempt + 1)
                     break
             else:
                 # If we couldn't find a valid design, use a simple heuristic
                 # For your cookie problem: distribute evenly within constraints
-                print(f"  Seed {seed_idx + 1}: Using heuristic design (couldn't find valid random)")
+                logger.debug("  Seed %d: Using heuristic design (couldn't find valid random)", seed_idx + 1)
                 design = {}
                 for var in problem.variables:
                     if var.type == 'categorical' and var.categories:
@@ -142,11 +145,11 @@ class OptimizationService:
                         design[var.name] = (min_val + max_val) / 2
                 seed_designs.append(tuple(sorted(design.items())))
         
-        print(f"Generated {len(seed_designs)} seed designs")
+        logger.debug("Generated %d seed designs", len(seed_designs))
         
         if len(seed_designs) == 0:
             # Fallback if no valid seeds found: just use random ones
-             print("Warning: Could not generate valid seed designs. Proceeding with random invalid seeds.")
+             logger.warning("Could not generate valid seed designs. Proceeding with random invalid seeds.")
              for _ in range(min(10, config.population_size)):
                 design = {}
                 for var in problem.variables:
@@ -1,30 +1,26 @@
+import re
 import time
-import random
+import secrets
+
+# Readiness signals, each compiled once and matched case-insensitively in a single C-level pass
+_READY_SIGNAL = re.compile(r"enough information|ready to formalize|can now formalize|sufficient information", re.IGNORECASE)
+_FORMALIZE = re.compile(r"formali[sz]e", re.IGNORECASE)
+_OFFER = re.compile(r"would you like|shall i|should i|want me to", re.IGNORECASE)
+_FORMALIZATION_TOPIC = re.compile(r"formali[sz]e|structured|problem definition", re.IGNORECASE)
+
+def now_ms() -> int:
+    """Current time in milliseconds; used as a dependency so a handler reads the clock once"""
+    return time.time_ns() // 1_000_000
 
 def generate_id() -> str:
     """Generate a unique ID for sessions/messages"""
-    return f"{int(time.time() * 1000)}-{random.randint(1000, 9999)}"
+    # 96 random bits: one C-level call, no same-millisecond collisions across requests or workers
+    return secrets.token_hex(12)
 
 def detect_formalization_readiness(text: str) -> bool:
     """Check if message text indicates readiness to formalize"""
-    lower_text = text.lower()
-    
-    # Check for explicit readiness signals
-    is_ready = (
-        ('enough information' in lower_text or 
-         'ready to formalize' in lower_text or
-         'can now formalize' in lower_text or 
-         'sufficient information' in lower_text) and
-        ('formalize' in lower_text or 'formalise' in lower_text)
-    ) or (
-        ('would you like' in lower_text or 
-         'shall i' in lower_text or 
-         'should i' in lower_text or 
-         'want me to' in lower_text) and
-        ('formalize' in lower_text or 
-         'formalise' in lower_text or 
-         'structured' in lower_text or 
-         'problem definition' in lower_text)
+    # Explicit readiness statement about formalizing, or an offer to formalize/structure the problem
+    return bool(
+        (_FORMALIZE.search(text) and _READY_SIGNAL.search(text))
+        or (_FORMALIZATION_TOPIC.search(text) and _OFFER.search(text))
     )
-    
-    return is_ready
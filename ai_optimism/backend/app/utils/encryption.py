@@ -3,7 +3,11 @@ Encryption utilities for API keys
 Uses Fernet symmetric encryption to encrypt/decrypt API keys before storage
 """
 import os
+import time
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
+from typing import Optional, Tuple
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
@@ -12,10 +16,12 @@ import base64
 # Path to the encryption key file
 ENCRYPTION_KEY_FILE = Path(__file__).parent.parent.parent / ".encryption_key"
 
+@lru_cache(maxsize=1)
 def _get_fernet() -> Fernet:
     """
     Get a Fernet instance with the encryption key.
     The key file contains a base64-encoded Fernet key.
+    The instance is built once per process, so the key file is only read on first use.
     """
     if ENCRYPTION_KEY_FILE.exists():
         # Read existing key (as text, it's base64 encoded)
@@ -50,12 +56,21 @@ def encrypt_api_key(api_key: str) -> str:
     # Return as base64 string for storage
     return base64.urlsafe_b64encode(encrypted).decode()
 
-def decrypt_api_key(encrypted_key: str) -> str:
+# Decrypted keys by session id: (expires_at, ciphertext, plaintext). A hit also needs the
+# ciphertext to match, which catches keys rotated by another worker; writers in this process
+# evict explicitly, and the TTL bounds how long a plaintext stays in memory at all.
+DECRYPTED_KEY_TTL = 60.0  # seconds
+DECRYPTED_KEY_CACHE_SIZE = 512
+_decrypted_keys: "OrderedDict[str, Tuple[float, str, str]]" = OrderedDict()
+
+def decrypt_api_key(encrypted_key: str, session_id: Optional[str] = None) -> str:
     """
     Decrypt an API key that was encrypted with encrypt_api_key.
     
     Args:
         encrypted_key: The base64-encoded encrypted API key
+        session_id: The session the key belongs to; when given, the plaintext is
+            cached for DECRYPTED_KEY_TTL seconds. Failures are not cached.
         
     Returns:
         The plaintext API key
@@ -63,13 +78,35 @@ def decrypt_api_key(encrypted_key: str) -> str:
     if not encrypted_key:
         raise ValueError("Encrypted key cannot be empty")
     
+    now = time.monotonic()
+    # Entries are kept in expiry order, so expired ones are all at the front
+    while _decrypted_keys and next(iter(_decrypted_keys.values()))[0] <= now:
+        _decrypted_keys.popitem(last=False)
+    
+    if session_id is not None:
+        entry = _decrypted_keys.get(session_id)
+        if entry is not None and entry[1] == encrypted_key:
+            return entry[2]
+    
     try:
         fernet = _get_fernet()
         # Decode from base64
         encrypted_bytes = base64.urlsafe_b64decode(encrypted_key.encode())
         # Decrypt
-        decrypted = fernet.decrypt(encrypted_bytes)
-        return decrypted.decode()
+        api_key = fernet.decrypt(encrypted_bytes).decode()
     except Exception as e:
         raise ValueError(f"Failed to decrypt API key: {str(e)}")
+    
+    if session_id is not None:
+        _decrypted_keys.pop(session_id, None)
+        _decrypted_keys[session_id] = (now + DECRYPTED_KEY_TTL, encrypted_key, api_key)
+        if len(_decrypted_keys) > DECRYPTED_KEY_CACHE_SIZE:
+            _decrypted_keys.popitem(last=False)
+    return api_key
 
+def forget_decrypted_api_key(session_id: Optional[str] = None) -> None:
+    """Drop the cached plaintext key for one session, or for all sessions when no id is given"""
+    if session_id is None:
+        _decrypted_keys.clear()
+    else:
+        _decrypted_keys.pop(session_id, None)
@@ -1,7 +1,23 @@
 import ast
+import copy
+import keyword
 import operator
 import math
-from typing import Dict, Any
+import os
+import re
+import warnings
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache, reduce
+from multiprocessing import get_context
+from types import CodeType
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import numba  # Optional: JIT kernels for batch evaluation
+except ImportError:
+    numba = None
 
 # Safe operators for ast evaluation
 SAFE_OPERATORS = {
@@ -39,103 +55,465 @@ SAFE_FUNCTIONS = {
 }
 
 
+def _np_min(*args):
+    """min() over arrays: element-wise minimum of the arguments (or of a single list)"""
+    if len(args) == 1:
+        return np.min(np.asarray(args[0], dtype=np.float64), axis=0)
+    return reduce(np.minimum, args)
+
+
+def _np_max(*args):
+    """max() over arrays: element-wise maximum of the arguments (or of a single list)"""
+    if len(args) == 1:
+        return np.max(np.asarray(args[0], dtype=np.float64), axis=0)
+    return reduce(np.maximum, args)
+
+
+# NumPy counterparts of SAFE_FUNCTIONS for evaluating over whole arrays of candidates
+NUMPY_FUNCTIONS = {
+    'abs': np.abs,
+    'min': _np_min,
+    'max': _np_max,
+    'sum': sum,
+    'round': np.round,
+    'pow': np.power,
+    'sqrt': np.sqrt,
+    'exp': np.exp,
+    'log': np.log,
+    'sin': np.sin,
+    'cos': np.cos,
+    'tan': np.tan,
+}
+
+# Functions available inside Numba kernels (compiled natively in nopython mode)
+JIT_FUNCTIONS = {
+    'abs': abs,
+    'min': min,
+    'max': max,
+    'round': round,
+    'pow': pow,
+    'sqrt': math.sqrt,
+    'exp': math.exp,
+    'log': math.log,
+    'sin': math.sin,
+    'cos': math.cos,
+    'tan': math.tan,
+}
+
+
+# eval() globals: built once and never mutated (expressions cannot assign). Variables are
+# passed as the locals mapping, so they shadow function names without copying any dict
+SAFE_GLOBALS = {'__builtins__': {}, **SAFE_FUNCTIONS}
+NUMPY_GLOBALS = {'__builtins__': {}, **NUMPY_FUNCTIONS}
+
+
+# AST nodes allowed in expressions: arithmetic, comparisons, conditionals, calls, list/tuple literals
+ALLOWED_NODES = (
+    ast.Expression, ast.Constant, ast.Name, ast.Load,
+    ast.BinOp, ast.UnaryOp, ast.Compare, ast.IfExp, ast.Call,
+    ast.List, ast.Tuple,
+) + tuple(SAFE_OPERATORS)
+
+
+# Longer expressions are rejected before parsing so one-off huge inputs can't fill the caches
+MAX_EXPRESSION_LENGTH = 4096
+
+
+@lru_cache(maxsize=4096)
+def parse_expression(expression: str) -> ast.Expression:
+    """
+    Parse and validate an expression once
+    Only whitelisted AST nodes are accepted; failures are not cached
+    """
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise ValueError(f"Expression too long (max {MAX_EXPRESSION_LENGTH} characters)")
+    tree = ast.parse(expression, mode='eval')
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            raise ValueError(f"Unsupported AST node: {type(node)}")
+    return tree
+
+
+@lru_cache(maxsize=4096)
+def compile_expression(expression: str) -> CodeType:
+    """Compile a validated expression to a code object once"""
+    return compile(parse_expression(expression), '<expr>', 'eval')
+
+
+@lru_cache(maxsize=256)
+def jit_expression(
+    expression: str, var_names: Tuple[str, ...]
+) -> Optional[Tuple[Tuple[str, ...], Callable]]:
+    """
+    Compile a numeric expression to a Numba ufunc over float64 arrays
+    The kernel takes the variables the expression references, in the returned order.
+    Returns None when Numba is not installed or the expression cannot be compiled
+    (e.g. list literals, unknown names); callers then use the NumPy path.
+    """
+    if numba is None:
+        return None
+    try:
+        tree = parse_expression(expression)
+        names = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+        args = tuple(name for name in var_names if name in names)
+        if not args or not names <= set(args) | set(JIT_FUNCTIONS):
+            return None
+        if any(isinstance(node, (ast.List, ast.Tuple)) for node in ast.walk(tree)):
+            return None
+        
+        # The AST is whitelisted, so the kernel only references args and JIT_FUNCTIONS
+        kernel = _build_function('_kernel', args, fold_constants(tree.body, args), dict(JIT_FUNCTIONS))
+        signature = numba.float64(*([numba.float64] * len(args)))
+        return args, numba.vectorize([signature])(kernel)
+    except Exception:
+        return None
+
+
+def clear_expression_cache() -> None:
+    """Drop every cached parse, code object, specialized function and JIT kernel"""
+    parse_expression.cache_clear()
+    compile_expression.cache_clear()
+    specialize_expression.cache_clear()
+    jit_expression.cache_clear()
+    _jit_hits.clear()
+    _jit_builds.clear()
+
+
+def expression_cache_info() -> Dict[str, Any]:
+    """Hit/miss statistics of the expression caches, for diagnostics"""
+    return {
+        'parse': parse_expression.cache_info()._asdict(),
+        'compile': compile_expression.cache_info()._asdict(),
+        'specialize': specialize_expression.cache_info()._asdict(),
+        'jit': jit_expression.cache_info()._asdict(),
+    }
+
+
+class _ConstantFolder(ast.NodeTransformer):
+    """Replace numeric subtrees whose operands are all constants with their value"""
+    
+    def __init__(self, shadowed: frozenset):
+        self.shadowed = shadowed
+    
+    @staticmethod
+    def _numbers(nodes) -> Optional[List[Any]]:
+        values = [node.value for node in nodes if isinstance(node, ast.Constant)]
+        if len(values) != len(nodes) or not all(isinstance(v, (int, float)) for v in values):
+            return None
+        return values
+    
+    @staticmethod
+    def _constant(node: ast.AST, compute: Callable[[], Any]) -> ast.AST:
+        try:
+            value = compute()
+        except Exception:
+            return node  # keep the subtree so the error is raised when the expression runs
+        # ints are always finite (and math.isfinite overflows on very large ones)
+        if isinstance(value, int) or (isinstance(value, float) and math.isfinite(value)):
+            return ast.copy_location(ast.Constant(value=value), node)
+        return node
+    
+    @staticmethod
+    def _bounded_pow(values: List[Any]) -> bool:
+        # Integer powers of literals can take arbitrarily long; floats overflow quickly
+        return len(values) != 2 or isinstance(values[0], float) or isinstance(values[1], float) or abs(values[1]) <= 128
+    
+    def visit_BinOp(self, node: ast.BinOp) -> ast.AST:
+        self.generic_visit(node)
+        values = self._numbers([node.left, node.right])
+        if values is None or (isinstance(node.op, ast.Pow) and not self._bounded_pow(values)):
+            return node
+        op = SAFE_OPERATORS[type(node.op)]
+        return self._constant(node, lambda: op(*values))
+    
+    def visit_UnaryOp(self, node: ast.UnaryOp) -> ast.AST:
+        self.generic_visit(node)
+        values = self._numbers([node.operand])
+        if values is None:
+            return node
+        op = SAFE_OPERATORS[type(node.op)]
+        return self._constant(node, lambda: op(values[0]))
+    
+    def visit_Call(self, node: ast.Call) -> ast.AST:
+        self.generic_visit(node)
+        if not isinstance(node.func, ast.Name) or node.keywords:
+            return node
+        name = node.func.id
+        # A variable with the same name replaces the function, so only unshadowed calls fold
+        if name not in SAFE_FUNCTIONS or name in self.shadowed:
+            return node
+        values = self._numbers(node.args)
+        if values is None or (name == 'pow' and not self._bounded_pow(values)):
+            return node
+        func = SAFE_FUNCTIONS[name]
+        return self._constant(node, lambda: func(*values))
+
+
+def fold_constants(body: ast.expr, var_names: Tuple[str, ...]) -> ast.expr:
+    """
+    Constant-fold a validated expression body, e.g. 2 * sqrt(2) becomes 2.8284271247461903
+    Needs the variable names because variables shadow function names.
+    """
+    return _ConstantFolder(frozenset(var_names)).visit(copy.deepcopy(body))
+
+
+def _build_function(name: str, params: Tuple[str, ...], body: ast.expr, namespace: Dict[str, Any]) -> Callable:
+    """Compile `def name(*params): return body` from an AST (no source round-trip)"""
+    function = ast.FunctionDef(
+        name=name,
+        args=ast.arguments(
+            posonlyargs=[], args=[ast.arg(arg=param) for param in params],
+            kwonlyargs=[], kw_defaults=[], defaults=[],
+        ),
+        body=[ast.Return(value=body)],
+        decorator_list=[],
+    )
+    module = ast.fix_missing_locations(ast.Module(body=[function], type_ignores=[]))
+    exec(compile(module, '<expr>', 'exec'), namespace)
+    return namespace[name]
+
+
+def is_specializable(var_names: Tuple[str, ...]) -> bool:
+    """Whether every variable name can be used as a function parameter"""
+    return all(name.isidentifier() and not keyword.iskeyword(name) for name in var_names)
+
+
+@lru_cache(maxsize=4096)
+def specialize_expression(expression: str, var_names: Tuple[str, ...]) -> Callable[..., Any]:
+    """
+    Compile an expression to a function taking the variables positionally
+    Built once per (expression, variable schema), so evaluating it needs no namespace dict.
+    var_names must pass is_specializable.
+    """
+    tree = parse_expression(expression)
+    # The AST is whitelisted, so the function only references parameters and SAFE_FUNCTIONS
+    body = fold_constants(tree.body, var_names)
+    return _build_function('_specialized', var_names, body, dict(SAFE_GLOBALS))
+
+
+def _numeric_result(result: Any) -> Any:
+    """Convert booleans to 1/0 and numbers to float; other results pass through"""
+    if isinstance(result, bool):
+        return 1.0 if result else 0.0
+    if isinstance(result, (int, float)):
+        return float(result)
+    return result
+
+
+def safe_eval_specialized(expression: str, var_names: Tuple[str, ...], values: Tuple[Any, ...]) -> Any:
+    """
+    safe_eval for a fixed variable schema: values are passed positionally (in var_names
+    order) to the function from specialize_expression. Results and errors match safe_eval.
+    """
+    try:
+        func = specialize_expression(expression, var_names)
+        try:
+            result = func(*values)
+        except NameError as e:
+            raise NameError(f"Variable '{e.name}' not defined")
+        return _numeric_result(result)
+    except Exception as e:
+        raise ValueError(f"Evaluation error: {str(e)}")
+
+
+# Batch evaluations an expression must see before it is JIT compiled: Numba's cold start
+# (50-200 ms) only pays off for expressions evaluated repeatedly, e.g. once per generation
+JIT_HIT_THRESHOLD = 10
+_JIT_HITS_MAXSIZE = 4096
+_jit_hits: Dict[Tuple[str, Tuple[str, ...]], int] = {}
+_warned_no_numba = False
+
+# Kernels are compiled on one background thread: a compile takes hundreds of milliseconds and
+# would otherwise stall the event loop (and every other request) in the request that made the
+# expression hot. The NumPy path serves the expression until its kernel is ready.
+_jit_compiler = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jit-compile")
+_jit_builds: Dict[Tuple[str, Tuple[str, ...]], Future] = {}
+
+
+def hot_jit_expression(
+    expression: str, var_names: Tuple[str, ...]
+) -> Optional[Tuple[Tuple[str, ...], Callable]]:
+    """
+    jit_expression, but only once the expression has been evaluated JIT_HIT_THRESHOLD times
+    The compile runs in the background; None is returned until the kernel is ready.
+    """
+    global _warned_no_numba
+    key = (expression, var_names)
+    hits = _jit_hits.get(key, 0) + 1
+    if hits <= JIT_HIT_THRESHOLD:
+        if len(_jit_hits) >= _JIT_HITS_MAXSIZE and key not in _jit_hits:
+            _jit_hits.clear()
+        _jit_hits[key] = hits
+    if hits < JIT_HIT_THRESHOLD:
+        return None
+    if numba is None:
+        if not _warned_no_numba:
+            _warned_no_numba = True
+            warnings.warn("numba is not installed; hot batch expressions use the NumPy path", RuntimeWarning)
+        return None
+    build = _jit_builds.get(key)
+    if build is None:
+        if len(_jit_builds) >= _JIT_HITS_MAXSIZE:
+            _jit_builds.clear()  # finished kernels stay in jit_expression's cache
+        _jit_builds[key] = _jit_compiler.submit(jit_expression, expression, var_names)
+        return None
+    return build.result() if build.done() else None
+
+
+# Python int/float literal syntax (float() alone would also accept 'inf', '1_0', ' 1')
+_INT_LITERAL = re.compile(r'0|[1-9][0-9]*')
+_FLOAT_LITERAL = re.compile(r'(?:[0-9]+\.[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?|[0-9]+[eE][+-]?[0-9]+')
+_BOOL_LITERALS = {'True': 1.0, 'False': 0.0}
+_NO_SHORTCUT = object()
+
+
+def _shortcut(expression: str, variables: Dict[str, Any]) -> Any:
+    """
+    Result of a bare variable name or numeric literal without parsing, or _NO_SHORTCUT
+    Matches what safe_eval would return for the same expression.
+    """
+    if expression in variables and expression.isidentifier() and not keyword.iskeyword(expression):
+        return _numeric_result(variables[expression])
+    if expression in _BOOL_LITERALS:
+        return _BOOL_LITERALS[expression]
+    if _INT_LITERAL.fullmatch(expression):
+        return _numeric_result(int(expression))
+    if _FLOAT_LITERAL.fullmatch(expression):
+        return float(expression)
+    return _NO_SHORTCUT
+
+
 def safe_eval(expression: str, variables: Dict[str, Any]) -> Any:
     """
     Safely evaluate a Python expression using AST
     Supports arithmetic, comparisons, conditionals, and common math functions
     """
     try:
-        # Parse the expression into an AST
-        tree = ast.parse(expression, mode='eval')
-        
-        def eval_node(node):
-            if isinstance(node, ast.Expression):
-                return eval_node(node.body)
-            
-            elif isinstance(node, ast.Constant):
-                return node.value
-            
-            elif isinstance(node, ast.Name):
-                # Variable lookup
-                if node.id in variables:
-                    return variables[node.id]
-                elif node.id in SAFE_FUNCTIONS:
-                    return SAFE_FUNCTIONS[node.id]
-                else:
-                    raise NameError(f"Variable '{node.id}' not defined")
-            
-            elif isinstance(node, ast.BinOp):
-                # Binary operations (+ - * / etc)
-                left = eval_node(node.left)
-                right = eval_node(node.right)
-                op_type = type(node.op)
-                if op_type in SAFE_OPERATORS:
-                    return SAFE_OPERATORS[op_type](left, right)
-                else:
-                    raise ValueError(f"Unsupported operator: {op_type}")
-            
-            elif isinstance(node, ast.UnaryOp):
-                # Unary operations (- +)
-                operand = eval_node(node.operand)
-                op_type = type(node.op)
-                if op_type in SAFE_OPERATORS:
-                    return SAFE_OPERATORS[op_type](operand)
-                else:
-                    raise ValueError(f"Unsupported unary operator: {op_type}")
-            
-            elif isinstance(node, ast.Compare):
-                # Comparison operations (< <= > >= == !=)
-                left = eval_node(node.left)
-                for op, comparator in zip(node.ops, node.comparators):
-                    right = eval_node(comparator)
-                    op_type = type(op)
-                    if op_type in SAFE_OPERATORS:
-                        if not SAFE_OPERATORS[op_type](left, right):
-                            return False
-                        left = right  # Chain comparisons
-                    else:
-                        raise ValueError(f"Unsupported comparison: {op_type}")
-                return True
-            
-            elif isinstance(node, ast.IfExp):
-                # Ternary/conditional expression (a if condition else b)
-                condition = eval_node(node.test)
-                if condition:
-                    return eval_node(node.body)
-                else:
-                    return eval_node(node.orelse)
-            
-            elif isinstance(node, ast.Call):
-                # Function calls
-                func = eval_node(node.func)
-                args = [eval_node(arg) for arg in node.args]
-                if callable(func):
-                    return func(*args)
-                else:
-                    raise ValueError(f"Not a callable: {func}")
-            
-            elif isinstance(node, ast.List):
-                # List literal
-                return [eval_node(elem) for elem in node.elts]
-            
-            elif isinstance(node, ast.Tuple):
-                # Tuple literal
-                return tuple(eval_node(elem) for elem in node.elts)
-            
-            else:
-                raise ValueError(f"Unsupported AST node: {type(node)}")
+        result = _shortcut(expression, variables)
+        if result is not _NO_SHORTCUT:
+            return result
         
-        result = eval_node(tree)
+        code = compile_expression(expression)
         
-        # Convert boolean to 1/0 for consistent numeric handling
-        if isinstance(result, bool):
-            return 1.0 if result else 0.0
+        # Variables shadow function names; builtins are never reachable
+        try:
+            result = eval(code, SAFE_GLOBALS, variables)
+        except NameError as e:
+            raise NameError(f"Variable '{e.name}' not defined")
         
-        # Ensure numeric result
-        if isinstance(result, (int, float)):
-            return float(result)
-        
-        return result
+        # Convert boolean to 1/0 and ensure numeric results are floats
+        return _numeric_result(result)
         
     except Exception as e:
         raise ValueError(f"Evaluation error: {str(e)}")
+
+
+def evaluate_expression_list(expressions: List[str], variables: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Evaluate expressions against one set of variables
+    Returns one {expression, value, error} dict per expression. Module-level and returning
+    plain data so chunks of a large request can run in worker processes.
+    """
+    # Every expression shares the same variables: pass them positionally to a function
+    # compiled once per (expression, variable names) instead of building a namespace each time
+    var_names = tuple(variables)
+    var_values = tuple(variables.values())
+    specialized = is_specializable(var_names)
+    
+    # Repeated expressions in one request are evaluated once
+    by_expression: Dict[str, Dict[str, Any]] = {}
+    for expr in dict.fromkeys(expressions):
+        try:
+            value = _shortcut(expr, variables)
+            if value is not _NO_SHORTCUT:
+                pass
+            elif specialized:
+                value = safe_eval_specialized(expr, var_names, var_values)
+            else:
+                value = safe_eval(expr, variables)
+            by_expression[expr] = {
+                "expression": expr,
+                "value": value if isinstance(value, (int, float)) else None,
+                "error": None,
+            }
+        except Exception as e:
+            by_expression[expr] = {"expression": expr, "value": None, "error": str(e)}
+    return [by_expression[expr] for expr in expressions]
+
+
+# Worker processes for large evaluation requests (started and stopped by the app lifespan).
+# Every uvicorn worker gets its own pool, so the cores are shared out between them
+# (BACKEND_WORKERS is what run.py passes to uvicorn; WEB_CONCURRENCY is uvicorn's own)
+SERVER_WORKERS = max(1, int(os.getenv("BACKEND_WORKERS") or os.getenv("WEB_CONCURRENCY") or 1))
+PROCESS_POOL_WORKERS = max(1, (os.cpu_count() or 1) // SERVER_WORKERS)
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def start_process_pool() -> None:
+    global _process_pool
+    if _process_pool is None:
+        # spawn: forking a process that already runs the event loop and DB threads is unsafe
+        _process_pool = ProcessPoolExecutor(max_workers=PROCESS_POOL_WORKERS, mp_context=get_context("spawn"))
+
+
+def shutdown_process_pool() -> None:
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(cancel_futures=True)
+        _process_pool = None
+
+
+def restart_process_pool() -> None:
+    """Replace a broken pool (e.g. a worker was OOM-killed) so later requests can use it again"""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+    start_process_pool()
+
+
+def get_process_pool() -> Optional[ProcessPoolExecutor]:
+    return _process_pool
+
+
+def safe_eval_batch(
+    expression: str, variable_batch: Dict[str, np.ndarray], size: int
+) -> Tuple[np.ndarray, List[Optional[str]]]:
+    """
+    Evaluate one expression over a batch of variable assignments
+    variable_batch maps each variable name to an array with one value per candidate.
+    The expression is evaluated once over whole arrays (through a Numba kernel once the
+    expression is hot and Numba is available, NumPy otherwise); candidates the vectorized
+    pass cannot handle (e.g. conditionals on arrays, non-finite results) fall back to
+    safe_eval so values and error messages match the scalar endpoint.
+    
+    Returns:
+        (values, errors): a float64 array of length size (NaN where there is no
+        numeric value) and a list of error messages (None on success)
+    """
+    errors: List[Optional[str]] = [None] * size
+    
+    try:
+        kernel = hot_jit_expression(expression, tuple(sorted(variable_batch)))
+        with np.errstate(all='ignore'):
+            if kernel is not None:
+                args, ufunc = kernel
+                result = ufunc(*(variable_batch[name] for name in args))
+            else:
+                result = eval(compile_expression(expression), NUMPY_GLOBALS, variable_batch)
+            values = np.array(np.broadcast_to(np.asarray(result, dtype=np.float64), (size,)))
+        fallback_rows = np.flatnonzero(~np.isfinite(values)).tolist()
+    except Exception:
+        values = np.full(size, np.nan)
+        fallback_rows = range(size)
+    
+    for i in fallback_rows:
+        row = {name: array[i].item() for name, array in variable_batch.items()}
+        try:
+            value = safe_eval(expression, row)
+            values[i] = value if isinstance(value, (int, float)) else np.nan
+        except Exception as e:
+            values[i] = np.nan
+            errors[i] = str(e)
+    
+    return values, errors
@@ -0,0 +1,74 @@
+"""
+Coalesced session heartbeats
+Clients ping every few seconds; the endpoint only records the latest timestamp per session
+and a background loop writes them all in one executemany UPDATE per interval
+"""
+import asyncio
+import logging
+from typing import Dict, Optional
+from sqlalchemy import bindparam, update
+from ..database import engine
+from ..models.session import Session
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_FLUSH_INTERVAL = 5.0  # seconds
+
+_pending: Dict[str, int] = {}
+_flush_task: Optional[asyncio.Task] = None
+
+# Never move lastActivity backwards: a message posted after the heartbeat already set a newer one
+_LAST_ACTIVITY_UPDATE = (
+    update(Session.__table__)
+    .where(
+        Session.__table__.c.id == bindparam("session_id"),
+        Session.__table__.c.lastActivity < bindparam("last_activity"),
+    )
+    .values(lastActivity=bindparam("last_activity"))
+)
+
+
+def record_heartbeat(session_id: str, timestamp: int) -> None:
+    if timestamp > _pending.get(session_id, 0):
+        _pending[session_id] = timestamp
+
+
+async def flush_heartbeats() -> None:
+    """Write every buffered heartbeat (rows deleted meanwhile simply match nothing)"""
+    global _pending
+    if not _pending:
+        return
+    batch, _pending = _pending, {}
+    async with engine.begin() as conn:
+        await conn.execute(
+            _LAST_ACTIVITY_UPDATE,
+            [{"session_id": session_id, "last_activity": ts} for session_id, ts in batch.items()],
+        )
+
+
+async def _flush_loop() -> None:
+    while True:
+        await asyncio.sleep(HEARTBEAT_FLUSH_INTERVAL)
+        try:
+            await flush_heartbeats()
+        except Exception:
+            logger.exception("Failed to flush session heartbeats")
+
+
+def start_heartbeat_flusher() -> None:
+    global _flush_task
+    if _flush_task is None:
+        _flush_task = asyncio.create_task(_flush_loop())
+
+
+async def stop_heartbeat_flusher() -> None:
+    """Stop the loop and write whatever is still buffered"""
+    global _flush_task
+    if _flush_task is not None:
+        _flush_task.cancel()
+        try:
+            await _flush_task
+        except asyncio.CancelledError:
+            pass
+        _flush_task = None
+    await flush_heartbeats()
@@ -0,0 +1,28 @@
+"""
+Shared outbound HTTP client
+One keep-alive pool for calls to AI providers, opened and closed with the app lifespan
+"""
+from typing import Optional
+import httpx
+
+HTTP_TIMEOUT = 10.0  # seconds
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=20, keepalive_expiry=30)
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def start_http_client() -> None:
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS)
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def get_http_client() -> Optional[httpx.AsyncClient]:
+    return _http_client
@@ -1,89 +1,229 @@
 """Helper functions for session-related operations"""
-from typing import Optional
-from sqlmodel import Session as DBSession, select
+import asyncio
+import time
+import weakref
+from collections import OrderedDict
+from typing import Optional, Tuple
+import httpx
+from fastapi import Response
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession as DBSession
 from ..models.session import (
-    Session, SessionResponse, MessageResponse, 
+    Session, SessionResponse, SessionSummaryResponse,
     AISessionConfig, MessageUpdateItem
 )
 from .encryption import decrypt_api_key
+from .http_client import get_http_client, HTTP_TIMEOUT
 
-# Import to check against MetaData class (not to use the class)
-try:
-    from sqlalchemy import MetaData as SQLAMetaData
-except ImportError:
-    SQLAMetaData = None
+# One lock per session id with requests in flight; entries vanish once no request holds them.
+# Locking is per process: different sessions still update in parallel, and the dict itself
+# needs no lock because nothing awaits between the lookup and the insert.
+_session_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def session_lock(session_id: str) -> asyncio.Lock:
+    """Lock serializing read-modify-write updates of a single session"""
+    lock = _session_locks.get(session_id)
+    if lock is None:
+        lock = _session_locks[session_id] = asyncio.Lock()
+    return lock
+
+
+# Serialized GET /sessions/{id} bodies, tagged with the (updatedAt, lastActivity) they were
+# built from. Writers invalidate their session explicitly; the version tag also catches
+# writes made by other worker processes and bodies stored by a read that raced a write.
+SESSION_BODY_CACHE_SIZE = 256
+SessionVersion = Tuple[int, int]
+_session_bodies: "OrderedDict[str, Tuple[SessionVersion, bytes]]" = OrderedDict()
+
+
+def cached_session_body(session_id: str, version: SessionVersion) -> Optional[bytes]:
+    entry = _session_bodies.get(session_id)
+    if entry is None or entry[0] != version:
+        return None
+    _session_bodies.move_to_end(session_id)
+    return entry[1]
+
+
+def store_session_body(session_id: str, version: SessionVersion, body: bytes) -> None:
+    _session_bodies[session_id] = (version, body)
+    _session_bodies.move_to_end(session_id)
+    if len(_session_bodies) > SESSION_BODY_CACHE_SIZE:
+        _session_bodies.popitem(last=False)
+
+
+def invalidate_session_body(session_id: Optional[str] = None) -> None:
+    """Drop the cached body for one session, or for all sessions when no id is given"""
+    if session_id is None:
+        _session_bodies.clear()
+    else:
+        _session_bodies.pop(session_id, None)
+
+
+# Serialized GET ai-config bodies (status only, never the key). Every writer in this process
+# invalidates, and the TTL bounds how long another worker's write can go unseen. 'pending'
+# bodies are never cached: the UI polls them and the validation result may be written by
+# another worker, whose update this process would otherwise hide for the whole TTL.
+AI_CONFIG_CACHE_TTL = 60.0  # seconds
+AI_CONFIG_CACHE_SIZE = 1024
+_ai_config_bodies: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+
+
+def cached_ai_config_body(session_id: str) -> Optional[bytes]:
+    entry = _ai_config_bodies.get(session_id)
+    if entry is None:
+        return None
+    if entry[0] <= time.monotonic():
+        del _ai_config_bodies[session_id]
+        return None
+    _ai_config_bodies.move_to_end(session_id)
+    return entry[1]
+
+
+def store_ai_config_body(session_id: str, body: bytes, status: str) -> None:
+    if status == "pending":
+        _ai_config_bodies.pop(session_id, None)
+        return
+    _ai_config_bodies[session_id] = (time.monotonic() + AI_CONFIG_CACHE_TTL, body)
+    _ai_config_bodies.move_to_end(session_id)
+    if len(_ai_config_bodies) > AI_CONFIG_CACHE_SIZE:
+        _ai_config_bodies.popitem(last=False)
+
+
+def invalidate_ai_config_body(session_id: Optional[str] = None) -> None:
+    """Drop the cached AI config for one session, or for all sessions when no id is given"""
+    if session_id is None:
+        _ai_config_bodies.clear()
+    else:
+        _ai_config_bodies.pop(session_id, None)
+
+
+def json_response(content: bytes) -> Response:
+    """
+    Wrap JSON already produced by pydantic-core
+    Returning a Response makes FastAPI skip validating the result against response_model again.
+    """
+    return Response(content=content, media_type="application/json")
 
 
 def session_to_response(session: Session) -> SessionResponse:
-    """Convert ORM Session to SessionResponse"""
-    return SessionResponse(
-        id=session.id,
-        mode=session.mode,
-        status=session.status,
-        userId=session.userId,
-        researcherId=session.researcherId,
-        createdAt=session.createdAt,
-        updatedAt=session.updatedAt,
-        lastActivity=session.lastActivity,
-        isResearcherTyping=session.isResearcherTyping,
-        isAIResponding=session.isAIResponding,
-        readyToFormalize=session.readyToFormalize,
-        messages=[MessageResponse.from_orm_message(m) for m in session.messages]
-    )
-
-
-def get_msg_attr(msg, attr, default=None):
-    """Helper to get attribute from message (handles dict or object)"""
-    if isinstance(msg, dict):
-        return msg.get(attr, default)
-    return getattr(msg, attr, default)
+    """Convert ORM Session to SessionResponse (messages are validated from attributes in one pass)"""
+    return SessionResponse.model_validate(session, from_attributes=True)
+
+
+async def session_exists(db: DBSession, session_id: str) -> bool:
+    """Existence check that reads only the primary key instead of the whole session row"""
+    return (await db.exec(select(Session.id).where(Session.id == session_id))).first() is not None
+
+
+def session_to_summary(session: Session, message_count: int) -> SessionSummaryResponse:
+    """Convert ORM Session to SessionSummaryResponse (messages are not loaded)"""
+    summary = SessionSummaryResponse.model_validate(session, from_attributes=True)
+    summary.messageCount = message_count
+    return summary
 
 
 def is_valid_metadata(metadata_value):
-    """Check if metadata_value is a valid dict (not SQLAlchemy MetaData class)"""
-    if metadata_value is None:
-        return False
-    if SQLAMetaData is not None and isinstance(metadata_value, SQLAMetaData):
-        return False
+    """
+    Check if metadata_value is a real dict
+    MessageUpdateItem types metadata as Optional[Dict], so Pydantic has already rejected
+    anything else (including SQLAlchemy's MetaData class); only None is filtered here.
+    """
     return isinstance(metadata_value, dict)
 
 
-async def validate_api_key(provider: str, api_key: str, model: str, endpoint: Optional[str] = None) -> tuple[bool, Optional[str]]:
+GOOGLE_MODELS_URL = "https://generativelanguage.googleapis.com/v1beta/models"
+# Rate limits, server errors and network failures say nothing about the key: retry them
+# briefly, then report the result as undetermined instead of marking the key invalid
+GOOGLE_KEY_CHECK_ATTEMPTS = 2
+GOOGLE_KEY_RETRY_DELAY = 0.5  # seconds
+
+
+async def _check_google_key(client: httpx.AsyncClient, api_key: str) -> tuple[Optional[bool], Optional[str]]:
+    """List models with the key: Google answers 400/401/403 for keys it does not accept"""
+    error = None
+    for attempt in range(GOOGLE_KEY_CHECK_ATTEMPTS):
+        if attempt:
+            await asyncio.sleep(GOOGLE_KEY_RETRY_DELAY)
+        try:
+            response = await client.get(GOOGLE_MODELS_URL, headers={"x-goog-api-key": api_key})
+        except httpx.HTTPError as e:
+            error = f"Could not reach Google API: {e.__class__.__name__}"
+            continue
+        if response.status_code == 200:
+            return True, None
+        if response.status_code in (400, 401, 403):
+            return False, "Invalid API key"
+        error = f"Google API returned HTTP {response.status_code}"
+    return None, error
+
+
+def check_api_key_format(provider: str, api_key: str) -> Optional[str]:
+    """Cheap local checks that need no provider round trip; returns the error, if any"""
+    if not api_key or not api_key.strip():
+        return "API key cannot be empty"
+    
+    # Basic format validation for Google Gemini keys
+    if provider == "google":
+        if not api_key.startswith("AI") and len(api_key) < 20:
+            return "Invalid API key format"
+    
+    return None
+
+
+async def validate_api_key(provider: str, api_key: str, model: str, endpoint: Optional[str] = None) -> tuple[Optional[bool], Optional[str]]:
     """
     Validate an API key by making a test request to the AI provider
     
     Returns:
-        (is_valid, error_message)
+        (is_valid, error_message); is_valid is None when the provider could not be
+        asked (network error, rate limit, server error) and the key's status is unknown
     """
-    if not api_key or not api_key.strip():
-        return False, "API key cannot be empty"
+    format_error = check_api_key_format(provider, api_key)
+    if format_error:
+        return False, format_error
     
-    # Basic format validation for Google Gemini keys
     if provider == "google":
-        if not api_key.startswith("AI") and len(api_key) < 20:
-            return False, "Invalid API key format"
+        # Reuse the app-wide keep-alive client; outside the app lifespan fall back to a one-off one
+        client = get_http_client()
+        if client is not None:
+            return await _check_google_key(client, api_key)
+        async with httpx.AsyncClient(timeout=HTTP_TIMEOUT) as client:
+            return await _check_google_key(client, api_key)
     
     # For other providers, you could add similar validation
-    # For a more robust validation, you could make an actual API call here
-    # but that would require additional dependencies
     
     return True, None
 
 
-def get_decrypted_api_key_for_session(session_id: str, db: DBSession) -> Optional[str]:
+# Upper bound on a single API key validation
+API_KEY_VALIDATION_TIMEOUT = 10.0  # seconds
+
+
+async def validate_api_key_bounded(provider: str, api_key: str, model: str, endpoint: Optional[str] = None) -> tuple[Optional[bool], Optional[str]]:
+    """validate_api_key, giving up (undetermined) instead of waiting longer than API_KEY_VALIDATION_TIMEOUT"""
+    try:
+        return await asyncio.wait_for(
+            validate_api_key(provider, api_key, model, endpoint), timeout=API_KEY_VALIDATION_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        return None, "API key validation timed out"
+
+
+async def get_decrypted_api_key_for_session(session_id: str, db: DBSession) -> Optional[str]:
     """
     Internal helper to get decrypted API key for a session
     This should only be used internally, never exposed via API
     """
-    ai_config = db.exec(
+    ai_config = (await db.exec(
         select(AISessionConfig).where(AISessionConfig.sessionId == session_id)
-    ).first()
+    )).first()
     
     if not ai_config:
         return None
     
     try:
-        return decrypt_api_key(ai_config.api_key_encrypted)
+        return decrypt_api_key(ai_config.api_key_encrypted, session_id)
     except Exception:
         return None
 
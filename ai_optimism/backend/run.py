@@ -1,6 +1,7 @@
 import uvicorn
 import subprocess
 import os
+import importlib.util
 import atexit
 import signal
 import sys
@@ -151,6 +152,22 @@ if __name__ == "__main__":
         print(f"  {ngrok_url}")
         print("=" * 70 + "\n")
     
+    # Worker processes: match the number of physical cores for production-style runs.
+    # Reload (development) mode only supports a single worker.
+    workers = int(os.getenv('BACKEND_WORKERS', '1'))
+    
     # Start the FastAPI server
+    # uvloop + httptools replace the asyncio loop and h11 parser (uvloop is unavailable on Windows)
     print("[Backend] Starting FastAPI server on http://0.0.0.0:8000")
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=8000,
+        reload=workers == 1,
+        workers=workers,
+        loop="uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+        http="httptools" if importlib.util.find_spec("httptools") else "h11",
+        backlog=4096,
+        limit_concurrency=1024,
+        timeout_keep_alive=30,
+    )
\ No newline at end of file
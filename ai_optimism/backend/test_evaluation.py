@@ -0,0 +1,43 @@
+import sys
+import os
+
+# Add backend to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+from app.utils.evaluation import safe_eval, safe_eval_specialized, evaluate_expression_list
+
+EXPRESSIONS = [
+    "(10**100)**5 > 5",
+    "x + (10**100)**2",
+    "x * 2 + sqrt(16)",
+    "1e308 * 10 + x",
+    "x / 0",
+    "max(x, 3) - min(1, 2)",
+]
+VARIABLES = {"x": 2}
+
+
+def _outcome(compute):
+    try:
+        return ("value", compute())
+    except Exception:
+        return ("error", None)
+
+
+def test_specialized_matches_safe_eval():
+    names = tuple(VARIABLES)
+    values = tuple(VARIABLES.values())
+    for expression in EXPRESSIONS:
+        expected = _outcome(lambda: safe_eval(expression, VARIABLES))
+        actual = _outcome(lambda: safe_eval_specialized(expression, names, values))
+        assert actual == expected, expression
+
+
+def test_expression_list_matches_safe_eval():
+    results = evaluate_expression_list(EXPRESSIONS, VARIABLES)
+    for expression, result in zip(EXPRESSIONS, results):
+        expected = _outcome(lambda: safe_eval(expression, VARIABLES))
+        assert (result["error"] is None) == (expected[0] == "value"), expression
+        if expected[0] == "value":
+            assert result["value"] == expected[1], expression
@@ -0,0 +1,123 @@
+import sys
+import os
+
+# Add backend to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app.middleware.cors import PureASGICORSMiddleware
+from app.middleware.body_limit import BodySizeLimitMiddleware
+
+CORS_CONFIGS = [
+    dict(allow_origins=["*"], allow_methods=["*"], allow_headers=["*"]),
+    dict(allow_origins=["*"], allow_methods=["*"], allow_headers=["*"], allow_credentials=True),
+    dict(
+        allow_origins=["http://allowed.example"], allow_methods=["GET", "POST"],
+        allow_headers=["X-Custom"], allow_credentials=True,
+    ),
+]
+
+ALLOWED = "http://allowed.example"
+DISALLOWED = "http://evil.example"
+
+# (method, headers) per case; preflights carry Access-Control-Request-Method
+CORS_CASES = {
+    "preflight": ("OPTIONS", {"Origin": ALLOWED, "Access-Control-Request-Method": "POST"}),
+    "preflight with headers": ("OPTIONS", {
+        "Origin": ALLOWED, "Access-Control-Request-Method": "POST",
+        "Access-Control-Request-Headers": "content-type, x-custom",
+    }),
+    "simple": ("GET", {"Origin": ALLOWED}),
+    "credentialed simple": ("GET", {"Origin": ALLOWED, "Cookie": "sid=1"}),
+    "no origin": ("GET", {}),
+    "disallowed origin preflight": ("OPTIONS", {"Origin": DISALLOWED, "Access-Control-Request-Method": "GET"}),
+    "disallowed origin simple": ("GET", {"Origin": DISALLOWED}),
+    "disallowed method": ("OPTIONS", {"Origin": ALLOWED, "Access-Control-Request-Method": "PATCH"}),
+    "disallowed header": ("OPTIONS", {
+        "Origin": ALLOWED, "Access-Control-Request-Method": "GET",
+        "Access-Control-Request-Headers": "x-forbidden",
+    }),
+}
+
+
+def _endpoint(request):
+    return PlainTextResponse("ok")
+
+
+def _cors_client(middleware_cls, config):
+    app = Starlette(
+        routes=[Route("/", _endpoint, methods=["GET", "POST"])],
+        middleware=[Middleware(middleware_cls, **config)],
+    )
+    return TestClient(app)
+
+
+def _cors_outcome(response):
+    headers = {
+        name: value for name, value in response.headers.items()
+        if name.startswith("access-control-") or name == "vary"
+    }
+    return response.status_code, headers
+
+
+def test_cors_matches_starlette():
+    for config in CORS_CONFIGS:
+        expected_client = _cors_client(CORSMiddleware, config)
+        actual_client = _cors_client(PureASGICORSMiddleware, config)
+        for name, (method, headers) in CORS_CASES.items():
+            expected = _cors_outcome(expected_client.request(method, "/", headers=headers))
+            actual = _cors_outcome(actual_client.request(method, "/", headers=headers))
+            assert actual == expected, (config, name, actual, expected)
+
+
+MAX_BODY_BYTES = 64
+
+
+def _body_limit_client():
+    app = FastAPI()
+
+    @app.post("/echo")
+    async def echo(payload: dict):
+        return payload
+
+    return TestClient(BodySizeLimitMiddleware(app, max_body_bytes=MAX_BODY_BYTES))
+
+
+def test_body_limit_rejects_declared_length():
+    client = _body_limit_client()
+    response = client.post(
+        "/echo", content=b'{"k": "' + b"x" * MAX_BODY_BYTES + b'"}',
+        headers={"content-type": "application/json"},
+    )
+    assert response.status_code == 413
+    assert response.json() == {"detail": "Request body too large"}
+
+
+def test_body_limit_rejects_streamed_body():
+    client = _body_limit_client()
+
+    def chunks():
+        yield b'{"k": "'
+        for _ in range(MAX_BODY_BYTES):
+            yield b"x"
+        yield b'"}'
+
+    # A generator body is sent chunked, without a content-length header
+    response = client.post("/echo", content=chunks(), headers={"content-type": "application/json"})
+    assert response.status_code == 413
+    assert response.json() == {"detail": "Request body too large"}
+
+
+def test_body_limit_passes_small_body():
+    client = _body_limit_client()
+    response = client.post("/echo", json={"k": "v"})
+    assert response.status_code == 200
+    assert response.json() == {"k": "v"}
@@ -26,7 +26,7 @@ import {
     Visibility,
     VisibilityOff,
 } from '@mui/icons-material';
-import { getAIConfig, setAIConfig, type AISessionConfigStatus } from '../services/sessionAIConfig';
+import { getAIConfig, setAIConfig, waitForAIConfigValidation, type AISessionConfigStatus } from '../services/sessionAIConfig';
 import type { AIProvider } from '../services/ai';
 
 interface SessionAIConnectionStatusProps {
@@ -123,14 +123,22 @@ export const SessionAIConnectionStatus: React.FC<SessionAIConnectionStatusProps>
                 setBy: 'researcher',
             });
             
-            console.log('[SessionAIConnectionStatus] API key pushed successfully:', result);
-            setSuccess(true);
+            console.log('[SessionAIConnectionStatus] API key pushed, waiting for validation:', result);
             
-            // Small delay to ensure backend has processed
-            await new Promise(resolve => setTimeout(resolve, 300));
+            // The key is validated in the background: only report success once it is connected
+            const validated = await waitForAIConfigValidation(sessionId);
+            setConfig(validated);
             
-            // Reload config immediately to show updated status (with loading indicator)
-            await loadConfig(true);
+            if (validated?.status !== 'connected') {
+                setError(
+                    validated?.status === 'error'
+                        ? `API key validation failed: ${validated.errorMessage || 'Invalid API key'}`
+                        : `Could not validate the API key yet${validated?.errorMessage ? ` (${validated.errorMessage})` : ''}. Check the status chip or push it again.`
+                );
+                return;
+            }
+            
+            setSuccess(true);
             
             // Clear form after success
             setTimeout(() => {
@@ -187,6 +195,9 @@ export const SessionAIConnectionStatus: React.FC<SessionAIConnectionStatusProps>
         if (config.status === 'error') {
             return `Error: ${config.errorMessage || 'Connection failed'}`;
         }
+        if (config.status === 'pending') {
+            return 'Validating...';
+        }
         return 'Disconnected';
     };
 
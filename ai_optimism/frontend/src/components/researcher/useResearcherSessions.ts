@@ -121,7 +121,7 @@ export const useResearcherSessions = () => {
     }
 
     if (!apiKey) {
-      alert('Please push an API key to this session first using the AI Connection Status chip.');
+      alert('Please push a valid API key to this session first using the AI Connection Status chip (it must show as connected).');
       return;
     }
 
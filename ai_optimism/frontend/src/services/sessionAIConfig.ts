@@ -29,7 +29,7 @@ export interface AISessionConfigStatus {
   provider: string;
   model: string;
   endpoint: string | null;
-  status: 'disconnected' | 'connected' | 'error';
+  status: 'disconnected' | 'pending' | 'connected' | 'error';
   lastValidated: number | null;
   setBy: 'user' | 'researcher';
   setAt: number;
@@ -45,7 +45,8 @@ export interface SetAISessionConfigRequest {
 }
 
 export interface ValidateAIConfigResponse {
-  status: 'connected' | 'error';
+  // Unchanged from before the call when the provider could not be reached
+  status: AISessionConfigStatus['status'];
   message: string;
   lastValidated: number | null;
 }
@@ -152,24 +153,46 @@ export async function validateAIConfig(sessionId: string): Promise<ValidateAICon
   return response.data;
 }
 
+/**
+ * Wait for the background validation of a newly set API key to finish
+ * Polls the config until it leaves 'pending' or the timeout passes, and returns the last
+ * config seen (still 'pending' on timeout, e.g. while the provider cannot be reached)
+ */
+export async function waitForAIConfigValidation(
+  sessionId: string,
+  timeoutMs = 15000,
+  intervalMs = 500
+): Promise<AISessionConfigStatus | null> {
+  const deadline = Date.now() + timeoutMs;
+  let config = await getAIConfig(sessionId);
+  while (config?.status === 'pending' && Date.now() < deadline) {
+    await new Promise(resolve => setTimeout(resolve, intervalMs));
+    config = await getAIConfig(sessionId);
+  }
+  return config;
+}
+
 /**
  * Get decrypted API key for making AI requests (not for display)
  * This should only be called when needed for API requests, never for UI display
- * Returns null if no config exists (404)
+ * Returns null if no config exists (404) or its key has not been validated (409)
  */
 export async function getAIConfigKey(sessionId: string): Promise<{
   apiKey: string;
   provider: string;
   model: string;
   endpoint: string | null;
+  status: AISessionConfigStatus['status'];
 } | null> {
   const apiClient = getApiClient();
   try {
     const response = await apiClient.get(`/sessions/${sessionId}/ai-config/key`);
-    return response.data;
+    // Never hand out a key that has not been confirmed by the provider
+    return response.data.status === 'connected' ? response.data : null;
   } catch (error: any) {
     // 404 means no config exists yet - this is expected and not an error
-    if (error.response?.status === 404) {
+    // 409 means the key is still being validated or was rejected - not usable yet
+    if (error.response?.status === 404 || error.response?.status === 409) {
       return null;
     }
     throw error;